@@ -6,12 +6,26 @@ export, and device status.
 """
 
 import logging
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
 logger = logging.getLogger(__name__)
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
+MAX_SESSIONS_PAGE = 500
+MAX_HISTORY_DAYS = 366
+
+
+def _int_arg(name: str, default: int) -> int:
+    """Read an integer query arg, falling back to default if absent or invalid."""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
 
 def register_routes(app, session_manager, analysis_service, pipeline):
     """Register all REST routes on the Flask app."""
@@ -26,13 +40,12 @@ def register_routes(app, session_manager, analysis_service, pipeline):
 
     @api_bp.route("/sessions", methods=["GET"])
     def list_sessions():
-        limit = request.args.get("limit", 50, type=int)
-        offset = request.args.get("offset", 0, type=int)
-        sessions = session_manager._db.list_sessions(limit=limit, offset=offset)
-        # Attach summary to each session for the Flutter client
-        for s in sessions:
-            summary = session_manager._db.get_summary(s["id"])
-            s["summary"] = summary
+        limit = min(max(_int_arg("limit", 50), 1), MAX_SESSIONS_PAGE)
+        offset = max(_int_arg("offset", 0), 0)
+        # Summaries are attached for the Flutter client
+        sessions = session_manager._db.list_sessions_with_summaries(
+            limit=limit, offset=offset
+        )
         return jsonify({"sessions": sessions})
 
     @api_bp.route("/sessions/active", methods=["GET"])
@@ -78,10 +91,16 @@ def register_routes(app, session_manager, analysis_service, pipeline):
     @api_bp.route("/sessions/<session_id>/export/csv", methods=["GET"])
     def export_csv(session_id):
         try:
-            filepath = session_manager.export_csv(session_id)
-            return send_file(filepath, as_attachment=True)
+            lines = session_manager.iter_csv(session_id)
         except ValueError as e:
             return jsonify({"error": str(e)}), 404
+        return Response(
+            stream_with_context(lines),
+            mimetype="text/csv",
+            headers={
+                "Content-Disposition": f"attachment; filename=session_{session_id}.csv"
+            },
+        )
 
     @api_bp.route("/sessions/<session_id>/export/summary", methods=["GET"])
     def export_summary(session_id):
@@ -95,7 +114,7 @@ def register_routes(app, session_manager, analysis_service, pipeline):
 
     @api_bp.route("/history/days", methods=["GET"])
     def history_days():
-        n_days = request.args.get("n", 30, type=int)
+        n_days = min(max(_int_arg("n", 30), 1), MAX_HISTORY_DAYS)
         days = analysis_service.get_history_days(n_days)
         return jsonify({"days": days})
 
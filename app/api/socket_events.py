@@ -16,34 +16,82 @@ Data flow:
 """
 
 import logging
+import threading
 import time
+from typing import TYPE_CHECKING
 
 from flask_socketio import SocketIO, emit
 
-from app.domain.pipeline import RealtimePipeline
-from app.ml.inference import InferenceResult
-from app.storage.session_manager import SessionManager
+if TYPE_CHECKING:
+    from app.domain.pipeline import RealtimePipeline
+    from app.ml.inference import InferenceResult
+    from app.storage.session_manager import SessionManager
 
 logger = logging.getLogger(__name__)
 
+# A phone UI cannot tell 4 Hz HR refreshes from faster ones
+HR_UPDATE_MIN_INTERVAL_SEC = 0.25
+
 
 def register_socket_events(
     socketio: SocketIO,
-    pipeline: RealtimePipeline,
-    session_manager: SessionManager,
+    pipeline: "RealtimePipeline",
+    session_manager: "SessionManager",
 ):
     """Register all Socket.IO event handlers."""
 
     # ─── Pipeline callbacks → Socket.IO emissions ───
 
-    def _on_inference(result: InferenceResult):
+    def _on_inference(result: "InferenceResult"):
         data = result.to_dict()
         logger.info("Emitting inference — stress=%.1f, load=%.1f, fatigue=%.1f",
                      result.scores.stress, result.scores.cognitive_load, result.scores.fatigue)
         socketio.emit("inference", data)
 
+    hr_emit = {"last": 0.0, "pending": None, "scheduled": False}
+    hr_lock = threading.Lock()
+
     def _on_hr_update(hr: int, timestamp: float):
-        socketio.emit("hr_update", {"hr": hr, "timestamp": timestamp})
+        payload = {"hr": hr, "timestamp": timestamp}
+        with hr_lock:
+            now = time.monotonic()
+            wait = HR_UPDATE_MIN_INTERVAL_SEC - (now - hr_emit["last"])
+            if wait > 0:
+                hr_emit["pending"] = payload
+                if not hr_emit["scheduled"]:
+                    hr_emit["scheduled"] = True
+                    socketio.start_background_task(_trailing_hr_update, wait)
+                return
+            hr_emit["last"] = now
+            hr_emit["pending"] = None
+        socketio.emit("hr_update", payload)
+
+    def _trailing_hr_update(delay: float):
+        """Emit the value held back by the debounce once the interval ends.
+
+        If a newer emit went out meanwhile, waits for its interval instead;
+        if nothing is held back any more, does nothing.
+        """
+        while delay > 0:
+            socketio.sleep(delay)
+            with hr_lock:
+                if hr_emit["pending"] is None:
+                    hr_emit["scheduled"] = False
+                    return
+                delay = HR_UPDATE_MIN_INTERVAL_SEC - (time.monotonic() - hr_emit["last"])
+                if delay <= 0:
+                    hr_emit["scheduled"] = False
+        _flush_hr_update()
+
+    def _flush_hr_update():
+        """Emit the last debounced HR so the UI ends on the true value."""
+        with hr_lock:
+            payload = hr_emit["pending"]
+            if payload is None:
+                return
+            hr_emit["last"] = time.monotonic()
+            hr_emit["pending"] = None
+        socketio.emit("hr_update", payload)
 
     pipeline.on_inference(_on_inference)
     pipeline.on_hr_update(_on_hr_update)
@@ -119,6 +167,7 @@ def register_socket_events(
 
         try:
             summary = pipeline.stop_session()
+            _flush_hr_update()
             emit("monitoring_status", {
                 "status": "stopped",
                 "reason": "user_stopped",
@@ -134,6 +183,7 @@ def register_socket_events(
         """Force-stop session (e.g., unexpected BLE disconnect on mobile)."""
         logger.warning("Force stop requested (mobile BLE disconnect)")
         summary = pipeline.force_stop_session()
+        _flush_hr_update()
         emit("monitoring_status", {
             "status": "stopped",
             "reason": "device_disconnected",
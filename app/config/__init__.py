@@ -1,3 +1,3 @@
-from .settings import AppConfig, load_config
+from .settings import AppConfig, load_config, reset_config
 
-__all__ = ["AppConfig", "load_config"]
+__all__ = ["AppConfig", "load_config", "reset_config"]
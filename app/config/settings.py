@@ -1,8 +1,9 @@
+import functools
 import os
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class SignalConfig:
     window_size_sec: float = 15.0
     window_step_sec: float = 1.0
@@ -13,7 +14,7 @@ class SignalConfig:
     interpolation_method: str = "cubic"
 
 
-@dataclass
+@dataclass(slots=True)
 class MLConfig:
     model_path: str = os.path.join(
         os.path.dirname(__file__), "..", "ml", "models", "cognitive_model.joblib"
@@ -26,7 +27,7 @@ class MLConfig:
     score_smoothing_alpha: float = 0.3
 
 
-@dataclass
+@dataclass(slots=True)
 class StorageConfig:
     db_path: str = os.path.join(
         os.path.dirname(__file__), "..", "..", "data", "cognitive.db"
@@ -34,12 +35,9 @@ class StorageConfig:
     sessions_dir: str = os.path.join(
         os.path.dirname(__file__), "..", "..", "data", "sessions"
     )
-    exports_dir: str = os.path.join(
-        os.path.dirname(__file__), "..", "..", "data", "exports"
-    )
 
 
-@dataclass
+@dataclass(slots=True)
 class ServerConfig:
     host: str = "0.0.0.0"
     port: int = 5000
@@ -48,7 +46,7 @@ class ServerConfig:
     socketio_async_mode: str = "threading"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AppConfig:
     signal: SignalConfig = field(default_factory=SignalConfig)
     ml: MLConfig = field(default_factory=MLConfig)
@@ -56,7 +54,13 @@ class AppConfig:
     server: ServerConfig = field(default_factory=ServerConfig)
 
 
+@functools.lru_cache(maxsize=None)
 def load_config() -> AppConfig:
+    """Build the config from the environment once per process.
+
+    The instance is shared: derive variants with dataclasses.replace()
+    instead of mutating it.
+    """
     config = AppConfig()
     config.server.host = os.getenv("HOST", config.server.host)
     config.server.port = int(os.getenv("PORT", config.server.port))
@@ -65,3 +69,8 @@ def load_config() -> AppConfig:
         "ASYNC_MODE", config.server.socketio_async_mode
     )
     return config
+
+
+def reset_config():
+    """Drop the cached config so the next load_config() re-reads the environment."""
+    load_config.cache_clear()
@@ -6,8 +6,9 @@ identification, and personalized recommendations.
 """
 
 import logging
+import operator
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from typing import Optional
 
 from app.storage.database import Database
@@ -20,8 +21,22 @@ RECOVERY_FATIGUE_THRESHOLD = 30
 HIGH_STRESS_THRESHOLD = 60
 HIGH_FATIGUE_THRESHOLD = 60
 
-
-@dataclass
+# (summary key, comparison, threshold, recommendation), in display order
+_RULES = (
+    ("avg_stress", operator.gt, HIGH_STRESS_THRESHOLD,
+     "Essayez une respiration profonde (cohérence cardiaque 5-5-5) pendant 5 minutes."),
+    ("avg_cognitive_load", operator.gt, OVERLOAD_THRESHOLD,
+     "Pensez à fractionner vos périodes de travail intense (technique Pomodoro)."),
+    ("time_overload_pct", operator.gt, 50,
+     "Plus de 50% de la session en surcharge cognitive. Prévoyez des pauses plus fréquentes."),
+    ("avg_fatigue", operator.gt, HIGH_FATIGUE_THRESHOLD,
+     "Niveau de fatigue élevé. Envisagez une pause longue ou un changement d'activité."),
+    ("time_recovery_pct", operator.lt, 10,
+     "Très peu de temps de récupération. Intégrez des micro-pauses régulières."),
+)
+
+
+@dataclass(slots=True)
 class CriticalPeriod:
     start_timestamp: float
     end_timestamp: float
@@ -30,7 +45,7 @@ class CriticalPeriod:
     duration_sec: float
 
 
-@dataclass
+@dataclass(slots=True)
 class DailyDigest:
     date: str
     avg_stress: float
@@ -44,154 +59,63 @@ class DailyDigest:
 class AnalysisService:
     def __init__(self, db: Database):
         self._db = db
+        # Digests of past days, which no longer change once their sessions end
+        self._digest_cache: dict[str, DailyDigest] = {}
 
     def get_daily_digest(self, date_str: str) -> Optional[DailyDigest]:
-        averages = self._db.get_daily_averages(date_str)
-        if not averages:
+        is_past = date_str < date.today().isoformat()
+        if is_past and date_str in self._digest_cache:
+            return self._digest_cache[date_str]
+
+        digest = self._compute_daily_digest(date_str)
+        if is_past and digest is not None:
+            self._digest_cache[date_str] = digest
+        return digest
+
+    def invalidate_day(self, date_str: str):
+        """Forget the cached digest for a day whose data changed."""
+        self._digest_cache.pop(date_str, None)
+
+    def _compute_daily_digest(self, date_str: str) -> Optional[DailyDigest]:
+        row = self._db.get_daily_digest_row(date_str)
+        if not row:
             return None
 
-        sessions = self._db.get_sessions_for_date(date_str)
-
         return DailyDigest(
             date=date_str,
-            avg_stress=round(averages.get("avg_stress", 0) or 0, 1),
-            avg_cognitive_load=round(averages.get("avg_cognitive_load", 0) or 0, 1),
-            avg_fatigue=round(averages.get("avg_fatigue", 0) or 0, 1),
-            avg_hr=round(averages.get("avg_hr", 0) or 0, 1),
+            avg_stress=row["avg_stress"],
+            avg_cognitive_load=row["avg_cognitive_load"],
+            avg_fatigue=row["avg_fatigue"],
+            avg_hr=row["avg_hr"],
             overload_pct=0.0,
-            session_count=len(sessions),
+            session_count=row["session_count"],
         )
 
     def get_weekly_evolution(self, end_date: Optional[str] = None) -> list[dict]:
         if end_date is None:
-            end_date = datetime.now().strftime("%Y-%m-%d")
+            end_date = date.today().isoformat()
         return self._db.get_weekly_stats(end_date)
 
     def detect_critical_periods(self, session_id: str) -> list[dict]:
-        data_points = self._db.get_session_data(session_id)
-        if not data_points:
-            return []
-
-        periods = []
-
-        # Detect overload periods (cognitive_load > 70)
-        periods.extend(
-            self._detect_periods(data_points, "cognitive_load", OVERLOAD_THRESHOLD, "overload", above=True)
-        )
-
-        # Detect recovery periods (low stress AND low fatigue)
-        periods.extend(
-            self._detect_recovery_periods(data_points)
+        # Overload (cognitive_load > 70), recovery (low stress AND low fatigue)
+        # and prolonged fatigue (fatigue > 60), detected in SQL
+        return self._db.get_critical_periods(
+            session_id,
+            overload_threshold=OVERLOAD_THRESHOLD,
+            fatigue_threshold=HIGH_FATIGUE_THRESHOLD,
+            recovery_stress_threshold=RECOVERY_STRESS_THRESHOLD,
+            recovery_fatigue_threshold=RECOVERY_FATIGUE_THRESHOLD,
         )
 
-        # Detect prolonged fatigue (fatigue > 60 for extended time)
-        periods.extend(
-            self._detect_periods(data_points, "fatigue", HIGH_FATIGUE_THRESHOLD, "prolonged_fatigue", above=True)
-        )
-
-        periods.sort(key=lambda p: p["start_timestamp"])
-        return periods
-
-    def _detect_periods(
-        self, data_points: list[dict], key: str, threshold: float,
-        period_type: str, above: bool, min_duration_sec: float = 30.0
-    ) -> list[dict]:
-        periods = []
-        in_period = False
-        start_ts = 0.0
-        values = []
-
-        for dp in data_points:
-            val = dp.get(key)
-            if val is None:
-                continue
-
-            is_active = (val > threshold) if above else (val < threshold)
-
-            if is_active and not in_period:
-                in_period = True
-                start_ts = dp["timestamp"]
-                values = [val]
-            elif is_active and in_period:
-                values.append(val)
-            elif not is_active and in_period:
-                duration = dp["timestamp"] - start_ts
-                if duration >= min_duration_sec and values:
-                    periods.append({
-                        "start_timestamp": start_ts,
-                        "end_timestamp": dp["timestamp"],
-                        "period_type": period_type,
-                        "avg_score": round(sum(values) / len(values), 1),
-                        "duration_sec": round(duration, 1),
-                    })
-                in_period = False
-                values = []
-
-        # Close open period
-        if in_period and values and data_points:
-            duration = data_points[-1]["timestamp"] - start_ts
-            if duration >= min_duration_sec:
-                periods.append({
-                    "start_timestamp": start_ts,
-                    "end_timestamp": data_points[-1]["timestamp"],
-                    "period_type": period_type,
-                    "avg_score": round(sum(values) / len(values), 1),
-                    "duration_sec": round(duration, 1),
-                })
-
-        return periods
-
-    def _detect_recovery_periods(self, data_points: list[dict]) -> list[dict]:
-        periods = []
-        in_recovery = False
-        start_ts = 0.0
-
-        for dp in data_points:
-            stress = dp.get("stress")
-            fatigue = dp.get("fatigue")
-            if stress is None or fatigue is None:
-                continue
-
-            is_recovery = stress < RECOVERY_STRESS_THRESHOLD and fatigue < RECOVERY_FATIGUE_THRESHOLD
-
-            if is_recovery and not in_recovery:
-                in_recovery = True
-                start_ts = dp["timestamp"]
-            elif not is_recovery and in_recovery:
-                duration = dp["timestamp"] - start_ts
-                if duration >= 30.0:
-                    periods.append({
-                        "start_timestamp": start_ts,
-                        "end_timestamp": dp["timestamp"],
-                        "period_type": "recovery",
-                        "avg_score": 0.0,
-                        "duration_sec": round(duration, 1),
-                    })
-                in_recovery = False
-
-        return periods
-
     def generate_recommendations(self, session_id: str) -> list[str]:
         summary = self._db.get_summary(session_id)
         if not summary:
             return []
 
-        recs = []
-
-        if (summary.get("avg_stress") or 0) > HIGH_STRESS_THRESHOLD:
-            recs.append("Essayez une respiration profonde (cohérence cardiaque 5-5-5) pendant 5 minutes.")
-
-        if (summary.get("avg_cognitive_load") or 0) > OVERLOAD_THRESHOLD:
-            recs.append("Pensez à fractionner vos périodes de travail intense (technique Pomodoro).")
-
-        if (summary.get("time_overload_pct") or 0) > 50:
-            recs.append("Plus de 50% de la session en surcharge cognitive. Prévoyez des pauses plus fréquentes.")
-
-        if (summary.get("avg_fatigue") or 0) > HIGH_FATIGUE_THRESHOLD:
-            recs.append("Niveau de fatigue élevé. Envisagez une pause longue ou un changement d'activité.")
-
-        if (summary.get("time_recovery_pct") or 0) < 10:
-            recs.append("Très peu de temps de récupération. Intégrez des micro-pauses régulières.")
+        recs = [
+            message for key, compare, threshold, message in _RULES
+            if compare(summary.get(key) or 0, threshold)
+        ]
 
         if not recs:
             recs.append("Bon équilibre cognitif. Continuez à maintenir ce rythme.")
@@ -200,19 +124,17 @@ class AnalysisService:
 
     def get_history_days(self, n_days: int = 30) -> list[dict]:
         """Get list of days with their summary scores."""
-        days = []
-        today = datetime.now()
-        for i in range(n_days):
-            date = today - timedelta(days=i)
-            date_str = date.strftime("%Y-%m-%d")
-            digest = self.get_daily_digest(date_str)
-            if digest:
-                days.append({
-                    "date": digest.date,
-                    "avg_stress": digest.avg_stress,
-                    "avg_cognitive_load": digest.avg_cognitive_load,
-                    "avg_fatigue": digest.avg_fatigue,
-                    "avg_hr": digest.avg_hr,
-                    "session_count": digest.session_count,
-                })
-        return days
+        today = date.today()
+        start_date = today - timedelta(days=n_days - 1)
+        rows = self._db.get_daily_digests_range(start_date.isoformat(), today.isoformat())
+        return [
+            {
+                "date": row["day"],
+                "avg_stress": row["avg_stress"],
+                "avg_cognitive_load": row["avg_cognitive_load"],
+                "avg_fatigue": row["avg_fatigue"],
+                "avg_hr": row["avg_hr"],
+                "session_count": row["session_count"],
+            }
+            for row in rows
+        ]
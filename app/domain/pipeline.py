@@ -8,15 +8,17 @@ inference -> storage -> WebSocket emission.
 
 import logging
 import time
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Callable, Optional
 
 from app.config.settings import AppConfig
-from app.features.hrv_features import HRVFeatureExtractor, HRVFeatures
-from app.ml.inference import CognitiveInference, InferenceResult
+from app.domain.types import DataPoint
 from app.signal.ppi_cleaning import PPICleaner
 from app.signal.windowing import SlidingWindow, WindowData
 from app.storage.session_manager import SessionManager
 
+if TYPE_CHECKING:
+    from app.ml.inference import InferenceResult
+
 logger = logging.getLogger(__name__)
 
 
@@ -27,7 +29,18 @@ class RealtimePipeline:
     via receive_ppi_data() and receive_hr_data().
     """
 
+    __slots__ = (
+        "_config", "_session_manager",
+        "_cleaner", "_window", "_feature_extractor", "_inference",
+        "_on_inference", "_on_hr_update",
+        "_current_hr", "_last_hr_time", "_last_early_time",
+    )
+
     def __init__(self, config: AppConfig, session_manager: SessionManager):
+        # scipy and the model stack are only pulled in once a pipeline is built
+        from app.features.hrv_features import HRVFeatureExtractor
+        from app.ml.inference import CognitiveInference
+
         self._config = config
         self._session_manager = session_manager
 
@@ -42,13 +55,12 @@ class RealtimePipeline:
         )
 
         # Callbacks
-        self._on_inference: Optional[Callable[[InferenceResult], None]] = None
+        self._on_inference: Optional[Callable[["InferenceResult"], None]] = None
         self._on_hr_update: Optional[Callable[[int, float], None]] = None
 
         # Current HR tracking
         self._current_hr: int = 0
         self._last_hr_time: float = 0.0
-        self._early_inference_sent: bool = False
         self._last_early_time: float = 0.0
 
         # Wire internal callback
@@ -58,7 +70,7 @@ class RealtimePipeline:
     def current_hr(self) -> int:
         return self._current_hr
 
-    def on_inference(self, callback: Callable[[InferenceResult], None]):
+    def on_inference(self, callback: Callable[["InferenceResult"], None]):
         self._on_inference = callback
 
     def on_hr_update(self, callback: Callable[[int, float], None]):
@@ -81,21 +93,15 @@ class RealtimePipeline:
 
             # Emit HR-only inference periodically when no PPI data is flowing.
             # This ensures scores still update even if PPI stream fails.
-            if self._window.sample_count == 0:
-                now = timestamp
-                if not self._early_inference_sent or (now - self._last_early_time > 3.0):
-                    self._emit_early_hr_inference(hr, timestamp)
-                    self._last_early_time = now
+            if self._window.sample_count == 0 and timestamp - self._last_early_time > 3.0:
+                self._emit_early_hr_inference(hr, timestamp)
+                self._last_early_time = timestamp
 
     # ─── Session management ───
 
     def start_session(self, activity_type: str = "autre"):
         """Start a new recording session (called when mobile starts monitoring)."""
-        self._window.reset()
-        self._inference.reset()
-        self._current_hr = 0
-        self._early_inference_sent = False
-        self._last_early_time = 0.0
+        self._reset_pipeline_state()
         session = self._session_manager.start_session(activity_type)
         logger.info("Session started — %s", session.id)
         return session
@@ -103,27 +109,27 @@ class RealtimePipeline:
     def stop_session(self) -> Optional[dict]:
         """Stop the current session (called when mobile stops monitoring)."""
         summary = self._session_manager.stop_session()
-        self._window.reset()
-        self._inference.reset()
-        self._current_hr = 0
-        self._early_inference_sent = False
-        self._last_early_time = 0.0
+        self._reset_pipeline_state()
         logger.info("Session stopped")
         return summary
 
     def force_stop_session(self) -> Optional[dict]:
         """Stop the active session (for unexpected disconnects from mobile)."""
         summary = self._session_manager.stop_session()
+        self._reset_pipeline_state()
+        return summary
+
+    def _reset_pipeline_state(self):
         self._window.reset()
         self._inference.reset()
         self._current_hr = 0
-        self._early_inference_sent = False
         self._last_early_time = 0.0
-        return summary
 
     # ─── Internal processing ───
 
     def _handle_window(self, window: WindowData):
+        if self._on_inference is None and not self._session_manager.is_recording:
+            return
         logger.info("Window received — %d samples, span=%.1fs",
                      window.sample_count, window.window_end - window.window_start)
         try:
@@ -131,23 +137,24 @@ class RealtimePipeline:
 
             # Store data point if session active
             if self._session_manager.is_recording:
-                data_point = {
-                    "timestamp": result.timestamp,
-                    "hr": result.features.mean_hr,
-                    "rmssd": result.features.rmssd,
-                    "sdnn": result.features.sdnn,
-                    "pnn50": result.features.pnn50,
-                    "mean_rr": result.features.mean_rr,
-                    "lf_power": result.features.lf_power,
-                    "hf_power": result.features.hf_power,
-                    "lf_hf_ratio": result.features.lf_hf_ratio,
-                    "stress": result.scores.stress,
-                    "cognitive_load": result.scores.cognitive_load,
-                    "fatigue": result.scores.fatigue,
-                    "window_quality": result.window_quality,
-                    "fatigue_slope": result.fatigue_trend.slope,
-                    "fatigue_predicted": result.fatigue_trend.predicted_fatigue_10min,
-                }
+                features = result.features
+                data_point = DataPoint(
+                    timestamp=result.timestamp,
+                    hr=features.mean_hr,
+                    rmssd=features.rmssd,
+                    sdnn=features.sdnn,
+                    pnn50=features.pnn50,
+                    mean_rr=features.mean_rr,
+                    lf_power=features.lf_power,
+                    hf_power=features.hf_power,
+                    lf_hf_ratio=features.lf_hf_ratio,
+                    stress=result.scores.stress,
+                    cognitive_load=result.scores.cognitive_load,
+                    fatigue=result.scores.fatigue,
+                    window_quality=result.window_quality,
+                    fatigue_slope=result.fatigue_trend.slope,
+                    fatigue_predicted=result.fatigue_trend.predicted_fatigue_10min,
+                )
                 self._session_manager.record_data_point(data_point)
 
             # Emit to WebSocket
@@ -163,10 +170,13 @@ class RealtimePipeline:
         Produces periodically updated scores so the UI always reflects
         the current HR, even if PPI streaming fails.
         """
-        from app.ml.inference import InferenceResult, FatigueTrend
+        if self._on_inference is None and not self._session_manager.is_recording:
+            return
+
+        from app.features.hrv_features import HRVFeatures
+        from app.ml.inference import InferenceResult
         from app.ml.model import CognitiveScores
 
-        self._early_inference_sent = True
         mean_rr = 60000.0 / hr if hr > 0 else 800.0
 
         # Rough estimates from HR (60-80 bpm = resting range)
@@ -196,7 +206,7 @@ class RealtimePipeline:
         )
 
         # Track fatigue trend
-        self._inference._fatigue_history.append((timestamp, scores.fatigue))
+        self._inference._push_fatigue(timestamp, scores.fatigue)
         fatigue_trend = self._inference._compute_fatigue_trend()
 
         result = InferenceResult(
@@ -207,17 +217,11 @@ class RealtimePipeline:
 
         # Store data point if session active
         if self._session_manager.is_recording:
-            self._session_manager.record_data_point({
-                "timestamp": timestamp,
-                "hr": float(hr),
-                "rmssd": 0, "sdnn": 0, "pnn50": 0, "mean_rr": mean_rr,
-                "lf_power": 0, "hf_power": 0, "lf_hf_ratio": 0,
-                "stress": scores.stress,
-                "cognitive_load": scores.cognitive_load,
-                "fatigue": scores.fatigue,
-                "window_quality": 0, "fatigue_slope": fatigue_trend.slope,
-                "fatigue_predicted": fatigue_trend.predicted_fatigue_10min,
-            })
+            self._session_manager.record_data_point(DataPoint.hr_only(
+                timestamp, float(hr), mean_rr,
+                scores.stress, scores.cognitive_load, scores.fatigue,
+                fatigue_trend.slope, fatigue_trend.predicted_fatigue_10min,
+            ))
 
         logger.info("HR-only inference — hr=%d stress=%.1f load=%.1f fatigue=%.1f",
                      hr, scores.stress, scores.cognitive_load, scores.fatigue)
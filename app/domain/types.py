@@ -0,0 +1,38 @@
+"""
+Value types shared between the pipeline and the storage layer.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class DataPoint:
+    """One persisted row of a session, fields in DATA_POINT_COLUMNS order."""
+
+    timestamp: float
+    hr: float
+    rmssd: float
+    sdnn: float
+    pnn50: float
+    mean_rr: float
+    lf_power: float
+    hf_power: float
+    lf_hf_ratio: float
+    stress: float
+    cognitive_load: float
+    fatigue: float
+    window_quality: float
+    fatigue_slope: float
+    fatigue_predicted: float
+
+    @classmethod
+    def hr_only(
+        cls, timestamp: float, hr: float, mean_rr: float,
+        stress: float, cognitive_load: float, fatigue: float,
+        fatigue_slope: float, fatigue_predicted: float,
+    ) -> "DataPoint":
+        """Point for HR-only inference: HRV fields and window quality are 0."""
+        return cls(
+            timestamp, hr, 0, 0, 0, mean_rr, 0, 0, 0,
+            stress, cognitive_load, fatigue, 0, fatigue_slope, fatigue_predicted,
+        )
@@ -13,15 +13,35 @@ from flask_socketio import SocketIO
 from app.api.routes import register_routes
 from app.api.socket_events import register_socket_events
 from app.config.settings import AppConfig, load_config
-from app.domain.analysis_service import AnalysisService
-from app.domain.pipeline import RealtimePipeline
-from app.storage.database import Database
-from app.storage.session_manager import SessionManager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 
+class _OrjsonCodec:
+    """json-module stand-in for Socket.IO packets, backed by orjson."""
+
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        # kwargs (e.g. separators) are stdlib options; orjson is always compact.
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+
 def create_app(config: AppConfig = None) -> tuple[Flask, SocketIO]:
+    # Deferred so importing the factory doesn't load numpy/scipy and the model
+    from app.domain.analysis_service import AnalysisService
+    from app.domain.pipeline import RealtimePipeline
+    from app.storage.database import Database
+    from app.storage.session_manager import SessionManager
+
     if config is None:
         config = load_config()
 
@@ -30,13 +50,15 @@ def create_app(config: AppConfig = None) -> tuple[Flask, SocketIO]:
     app.config["SECRET_KEY"] = "cognitive-api-secret"
     CORS(app, resources={r"/api/*": {"origins": config.server.cors_origins}})
 
-    # SocketIO
+    # SocketIO (orjson speeds up per-event encoding when installed)
+    socketio_options = {"json": _OrjsonCodec} if orjson is not None else {}
     socketio = SocketIO(
         app,
         cors_allowed_origins=config.server.cors_origins,
         async_mode=config.server.socketio_async_mode,
         logger=False,
         engineio_logger=False,
+        **socketio_options,
     )
 
     # Storage
@@ -46,6 +68,10 @@ def create_app(config: AppConfig = None) -> tuple[Flask, SocketIO]:
     # Domain
     pipeline = RealtimePipeline(config, session_manager)
     analysis_service = AnalysisService(db)
+    # A session that crossed midnight keeps adding to its (now past) start day
+    session_manager.on_session_stopped(
+        lambda session: analysis_service.invalidate_day(session.start_day)
+    )
 
     # API
     register_routes(app, session_manager, analysis_service, pipeline)
@@ -6,15 +6,90 @@ used as input to the cognitive state prediction models.
 """
 
 import logging
+import math
 from dataclasses import dataclass
 
 import numpy as np
-from scipy import interpolate, signal as sp_signal
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import fft as sp_fft, signal as sp_signal
+from scipy.interpolate import CubicSpline
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+def _rr_stats_loop(rr):
+    """Single pass over rr -> (mean, sdnn, rmssd, sdsd, nn50, sd1, sd2).
+
+    Welford accumulators for the RR mean/variance and for the successive
+    differences and sums, so no temporary arrays are needed. SD1/SD2 are
+    the sample standard deviations of rr[i+1] - rr[i] and rr[i+1] + rr[i],
+    divided by sqrt(2). Compiled with numba when available.
+    """
+    n = rr.shape[0]
+    mean = 0.0
+    m2 = 0.0
+    d_mean = 0.0
+    d_m2 = 0.0
+    s_mean = 0.0
+    s_m2 = 0.0
+    sq_sum = 0.0
+    nn50 = 0
+    for i in range(n):
+        x = rr[i]
+        delta = x - mean
+        mean += delta / (i + 1)
+        m2 += delta * (x - mean)
+        if i > 0:
+            d = x - rr[i - 1]
+            delta = d - d_mean
+            d_mean += delta / i
+            d_m2 += delta * (d - d_mean)
+            s = x + rr[i - 1]
+            delta = s - s_mean
+            s_mean += delta / i
+            s_m2 += delta * (s - s_mean)
+            sq_sum += d * d
+            if abs(d) > 50.0:
+                nn50 += 1
+    sdnn = math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+    rmssd = math.sqrt(sq_sum / (n - 1)) if n > 1 else 0.0
+    if n > 2:
+        sdsd = math.sqrt(d_m2 / (n - 2))
+        sd1 = math.sqrt(d_m2 / (n - 2) / 2.0)
+        sd2 = math.sqrt(s_m2 / (n - 2) / 2.0)
+    else:
+        sdsd = sd1 = sd2 = 0.0
+    return mean, sdnn, rmssd, sdsd, nn50, sd1, sd2
+
+
+def _rr_stats_numpy(rr):
+    """NumPy equivalent of _rr_stats_loop, used when numba is missing."""
+    mean = float(np.mean(rr))
+    sdnn = float(np.std(rr, ddof=1)) if len(rr) > 1 else 0.0
+    diffs = np.diff(rr)
+    rmssd = float(np.sqrt(np.mean(diffs ** 2))) if len(diffs) > 0 else 0.0
+    nn50 = int(np.count_nonzero((diffs > 50) | (diffs < -50)))
+    if len(diffs) > 1:
+        sdsd = float(np.std(diffs, ddof=1))
+        sd1 = sdsd / np.sqrt(2)
+        sd2 = float(np.std(rr[1:] + rr[:-1], ddof=1) / np.sqrt(2))
+    else:
+        sdsd = sd1 = sd2 = 0.0
+    return mean, sdnn, rmssd, sdsd, nn50, sd1, sd2
+
+
+if njit is not None:
+    _rr_stats = njit(cache=True)(_rr_stats_loop)
+else:
+    _rr_stats = _rr_stats_numpy
+
+
+@dataclass(slots=True)
 class HRVFeatures:
     # Time-domain
     mean_hr: float
@@ -80,6 +155,8 @@ class HRVFeatures:
         ])
 
 
+RESAMPLE_HZ = 4.0
+
 FEATURE_NAMES = [
     "mean_hr", "mean_rr", "sdnn", "rmssd", "pnn50", "sdsd", "cv_rr",
     "lf_power", "hf_power", "lf_hf_ratio", "total_power",
@@ -87,7 +164,77 @@ FEATURE_NAMES = [
 ]
 
 
+@dataclass(frozen=True)
+class _WelchPlan:
+    """Hann window, bin scaling and frequencies for one segment length.
+
+    Reproduces scipy.signal.welch(x, fs, nperseg, noverlap=nperseg // 2)
+    with its defaults (periodic Hann, constant detrend per segment,
+    one-sided density) without rebuilding the window on each call.
+    """
+
+    window: np.ndarray
+    step: int
+    scale: np.ndarray
+    freqs: np.ndarray
+    df: float
+    lf_band: slice  # 0.04 <= f < 0.15 Hz
+    hf_band: slice  # 0.15 <= f <= 0.40 Hz
+
+    @classmethod
+    def build(cls, nperseg: int, fs: float) -> "_WelchPlan":
+        window = sp_signal.get_window("hann", nperseg)
+        # Density scaling, doubled for the one-sided spectrum except at
+        # DC and (for even lengths) Nyquist
+        scale = np.full(nperseg // 2 + 1, 2.0 / (fs * np.sum(window ** 2)))
+        scale[0] /= 2.0
+        if nperseg % 2 == 0:
+            scale[-1] /= 2.0
+        freqs = sp_fft.rfftfreq(nperseg, 1.0 / fs)
+        lf_lo, lf_hi = np.searchsorted(freqs, (0.04, 0.15))
+        hf_hi = np.searchsorted(freqs, 0.40, side="right")
+        return cls(
+            window=window,
+            step=nperseg - nperseg // 2,
+            scale=scale,
+            freqs=freqs,
+            df=fs / nperseg,
+            lf_band=slice(int(lf_lo), int(lf_hi)),
+            hf_band=slice(int(lf_hi), int(hf_hi)),
+        )
+
+    def psd(self, x: np.ndarray) -> np.ndarray:
+        segments = sliding_window_view(x, len(self.window))[::self.step]
+        segments = segments - segments.mean(axis=1, keepdims=True)
+        spectrum = sp_fft.rfft(segments * self.window, axis=1)
+        power = spectrum.real ** 2 + spectrum.imag ** 2
+        return power.mean(axis=0) * self.scale
+
+    def band_power(self, psd: np.ndarray, band: slice) -> float:
+        """Trapezoidal integral of psd over the bins in band (uniform spacing)."""
+        values = psd[band]
+        if len(values) < 2:
+            return 0.0
+        return float(self.df * (values.sum() - 0.5 * (values[0] + values[-1])))
+
+
 class HRVFeatureExtractor:
+    def __init__(self):
+        # Welch plans by segment length (windows shorter than 64 s use fewer
+        # than 256 points, so the length varies with window size)
+        self._welch_plans: dict[int, _WelchPlan] = {}
+        # Resampling grids by length; window spans only vary by a few samples
+        self._grids: dict[int, np.ndarray] = {}
+
+    def _uniform_grid(self, n: int) -> np.ndarray:
+        """np.arange(0, n / RESAMPLE_HZ, 1 / RESAMPLE_HZ), cached (read-only)."""
+        grid = self._grids.get(n)
+        if grid is None:
+            grid = np.arange(n) / RESAMPLE_HZ
+            grid.flags.writeable = False
+            self._grids[n] = grid
+        return grid
+
     def extract(
         self, rr_intervals_ms: np.ndarray, quality_ratio: float = 1.0
     ) -> HRVFeatures:
@@ -96,9 +243,10 @@ class HRVFeatureExtractor:
 
         rr = rr_intervals_ms.astype(np.float64)
 
-        time_features = self._time_domain(rr)
+        mean_rr, sdnn, rmssd, sdsd, nn50, sd1, sd2 = _rr_stats(rr)
+        time_features = self._time_domain(len(rr), mean_rr, sdnn, rmssd, sdsd, nn50)
         freq_features = self._frequency_domain(rr)
-        nonlinear = self._nonlinear(rr)
+        nonlinear = self._nonlinear(sd1, sd2)
 
         return HRVFeatures(
             **time_features,
@@ -108,17 +256,14 @@ class HRVFeatureExtractor:
             sample_count=len(rr),
         )
 
-    def _time_domain(self, rr: np.ndarray) -> dict:
-        mean_rr = float(np.mean(rr))
+    def _time_domain(
+        self, n: int, mean_rr: float, sdnn: float, rmssd: float,
+        sdsd: float, nn50: int,
+    ) -> dict:
         mean_hr = 60000.0 / mean_rr if mean_rr > 0 else 0.0
-        sdnn = float(np.std(rr, ddof=1)) if len(rr) > 1 else 0.0
 
-        diffs = np.diff(rr)
-        rmssd = float(np.sqrt(np.mean(diffs ** 2))) if len(diffs) > 0 else 0.0
-        sdsd = float(np.std(diffs, ddof=1)) if len(diffs) > 1 else 0.0
-
-        nn50 = int(np.sum(np.abs(diffs) > 50))
-        pnn50 = float(nn50) / len(diffs) * 100.0 if len(diffs) > 0 else 0.0
+        n_diffs = n - 1
+        pnn50 = float(nn50) / n_diffs * 100.0 if n_diffs > 0 else 0.0
 
         cv_rr = sdnn / mean_rr if mean_rr > 0 else 0.0
 
@@ -134,61 +279,46 @@ class HRVFeatureExtractor:
 
     def _frequency_domain(self, rr: np.ndarray) -> dict:
         """Compute LF/HF power via Welch's method on interpolated RR series."""
-        try:
-            # Build cumulative time axis in seconds
-            t_rr = np.cumsum(rr) / 1000.0
-            t_rr -= t_rr[0]
-
-            if t_rr[-1] < 10.0:
-                return {"lf_power": 0.0, "hf_power": 0.0, "lf_hf_ratio": 0.0, "total_power": 0.0}
-
-            # Resample at 4 Hz
-            fs = 4.0
-            t_uniform = np.arange(0, t_rr[-1], 1.0 / fs)
-            f_interp = interpolate.interp1d(
-                t_rr, rr, kind="cubic", fill_value="extrapolate"
-            )
-            rr_uniform = f_interp(t_uniform)
-
-            # Detrend
-            rr_uniform = rr_uniform - np.mean(rr_uniform)
-
-            # Welch PSD
-            nperseg = min(256, len(rr_uniform))
-            freqs, psd = sp_signal.welch(
-                rr_uniform, fs=fs, nperseg=nperseg, noverlap=nperseg // 2
-            )
-
-            lf_mask = (freqs >= 0.04) & (freqs < 0.15)
-            hf_mask = (freqs >= 0.15) & (freqs <= 0.40)
-
-            lf_power = float(np.trapz(psd[lf_mask], freqs[lf_mask])) if np.any(lf_mask) else 0.0
-            hf_power = float(np.trapz(psd[hf_mask], freqs[hf_mask])) if np.any(hf_mask) else 0.0
-            total_power = lf_power + hf_power
-            lf_hf_ratio = lf_power / hf_power if hf_power > 0 else 0.0
-
-            return {
-                "lf_power": lf_power,
-                "hf_power": hf_power,
-                "lf_hf_ratio": lf_hf_ratio,
-                "total_power": total_power,
-            }
-        except Exception as e:
-            logger.warning("Frequency domain extraction failed: %s", e)
-            return {"lf_power": 0.0, "hf_power": 0.0, "lf_hf_ratio": 0.0, "total_power": 0.0}
-
-    def _nonlinear(self, rr: np.ndarray) -> dict:
-        """Poincaré plot analysis."""
-        if len(rr) < 4:
-            return {"sd1": 0.0, "sd2": 0.0, "sd_ratio": 0.0}
+        zeros = {"lf_power": 0.0, "hf_power": 0.0, "lf_hf_ratio": 0.0, "total_power": 0.0}
 
-        rr_n = rr[:-1]
-        rr_n1 = rr[1:]
-        diff = rr_n1 - rr_n
-        summ = rr_n1 + rr_n
+        # Build cumulative time axis in seconds
+        t_rr = np.cumsum(rr) / 1000.0
+        t_rr -= t_rr[0]
 
-        sd1 = float(np.std(diff, ddof=1) / np.sqrt(2))
-        sd2 = float(np.std(summ, ddof=1) / np.sqrt(2))
+        # The spline needs a strictly increasing, finite time axis (NaN
+        # fails the comparison), and Welch needs at least 10 s of data
+        if not np.all(t_rr[1:] > t_rr[:-1]) or t_rr[-1] < 10.0:
+            return zeros
+
+        # Resample at 4 Hz
+        fs = RESAMPLE_HZ
+        t_uniform = self._uniform_grid(int(np.ceil(t_rr[-1] * fs)))
+        rr_uniform = CubicSpline(t_rr, rr, extrapolate=True)(t_uniform)
+
+        # Detrend (the spline output is a fresh array)
+        rr_uniform -= rr_uniform.mean()
+
+        # Welch PSD
+        nperseg = min(256, len(rr_uniform))
+        plan = self._welch_plans.get(nperseg)
+        if plan is None:
+            plan = self._welch_plans[nperseg] = _WelchPlan.build(nperseg, fs)
+        psd = plan.psd(rr_uniform)
+
+        lf_power = plan.band_power(psd, plan.lf_band)
+        hf_power = plan.band_power(psd, plan.hf_band)
+        total_power = lf_power + hf_power
+        lf_hf_ratio = lf_power / hf_power if hf_power > 0 else 0.0
+
+        return {
+            "lf_power": lf_power,
+            "hf_power": hf_power,
+            "lf_hf_ratio": lf_hf_ratio,
+            "total_power": total_power,
+        }
+
+    def _nonlinear(self, sd1: float, sd2: float) -> dict:
+        """Poincaré plot analysis."""
         sd_ratio = sd1 / sd2 if sd2 > 0 else 0.0
 
         return {"sd1": sd1, "sd2": sd2, "sd_ratio": sd_ratio}
@@ -13,21 +13,24 @@ import numpy as np
 
 from app.config.settings import MLConfig
 from app.features.hrv_features import HRVFeatureExtractor, HRVFeatures
-from app.ml.model import CognitiveModel, CognitiveScores
+from app.ml.model import CognitiveScores, load_model
 from app.signal.ppi_cleaning import CleanedPPI, PPICleaner
 from app.signal.windowing import WindowData
 
 logger = logging.getLogger(__name__)
 
+# Relative threshold under which a running-sum variance is rounding noise
+_TREND_EPS = 1e-12
 
-@dataclass
+
+@dataclass(slots=True)
 class FatigueTrend:
     slope: float  # positive = increasing fatigue
     predicted_fatigue_10min: float
     confidence: float  # 0–1
 
 
-@dataclass
+@dataclass(slots=True)
 class InferenceResult:
     scores: CognitiveScores
     features: HRVFeatures
@@ -61,20 +64,25 @@ class CognitiveInference:
         self._config = ml_config
         self._cleaner = cleaner
         self._extractor = feature_extractor
-        self._model = CognitiveModel(ml_config.model_path, ml_config.scaler_path)
+        self._model = load_model(ml_config.model_path, ml_config.scaler_path)
 
         # Smoothing state
         self._alpha = ml_config.score_smoothing_alpha
         self._prev_scores: CognitiveScores | None = None
 
-        # Fatigue trend tracking
+        # Fatigue trend tracking: running least-squares sums over the history,
+        # time in minutes from _trend_origin (re-anchored periodically so the
+        # sums stay small and add/subtract drift is flushed)
         self._fatigue_history: deque[tuple[float, float]] = deque(maxlen=120)
+        self._trend_origin = 0.0
+        self._pushes_since_rebase = 0
+        self._sx = self._sxx = self._sy = self._syy = self._sxy = 0.0
 
     def process_window(self, window: WindowData) -> InferenceResult:
         # 1. Clean PPI
         cleaned = self._cleaner.clean(
-            ppi_ms=window.ppi_ms.astype(int).tolist(),
-            timestamps=window.timestamps.tolist(),
+            ppi_ms=window.ppi_ms,
+            timestamps=window.timestamps,
         )
 
         # 2. Interpolate if needed
@@ -91,7 +99,7 @@ class CognitiveInference:
         scores = self._smooth(raw_scores)
 
         # 6. Track fatigue trend
-        self._fatigue_history.append((scores.timestamp, scores.fatigue))
+        self._push_fatigue(scores.timestamp, scores.fatigue)
         fatigue_trend = self._compute_fatigue_trend()
 
         return InferenceResult(
@@ -117,33 +125,59 @@ class CognitiveInference:
         self._prev_scores = smoothed
         return smoothed
 
+    def _push_fatigue(self, timestamp: float, fatigue: float):
+        history = self._fatigue_history
+        if not history:
+            self._trend_origin = timestamp
+        elif len(history) == history.maxlen:
+            self._accumulate_trend(*history[0], sign=-1.0)
+        history.append((timestamp, fatigue))
+        self._accumulate_trend(timestamp, fatigue, sign=1.0)
+
+        self._pushes_since_rebase += 1
+        if self._pushes_since_rebase >= history.maxlen:
+            self._rebase_trend()
+
+    def _accumulate_trend(self, timestamp: float, fatigue: float, sign: float):
+        x = (timestamp - self._trend_origin) / 60.0
+        self._sx += sign * x
+        self._sxx += sign * x * x
+        self._sy += sign * fatigue
+        self._syy += sign * fatigue * fatigue
+        self._sxy += sign * x * fatigue
+
+    def _rebase_trend(self):
+        self._trend_origin = self._fatigue_history[0][0] if self._fatigue_history else 0.0
+        self._sx = self._sxx = self._sy = self._syy = self._sxy = 0.0
+        for timestamp, fatigue in self._fatigue_history:
+            self._accumulate_trend(timestamp, fatigue, sign=1.0)
+        self._pushes_since_rebase = 0
+
     def _compute_fatigue_trend(self) -> FatigueTrend:
-        if len(self._fatigue_history) < 6:
+        history = self._fatigue_history
+        n = len(history)
+        if n < 6:
             return FatigueTrend(slope=0.0, predicted_fatigue_10min=0.0, confidence=0.0)
 
-        times = np.array([t for t, _ in self._fatigue_history])
-        values = np.array([v for _, v in self._fatigue_history])
-
-        # Normalize time to minutes
-        t_min = (times - times[0]) / 60.0
-
-        # Linear regression
-        coeffs = np.polyfit(t_min, values, 1)
-        slope = float(coeffs[0])  # fatigue points per minute
+        # Linear regression (fatigue points per minute) from the running sums;
+        # n² times the variances / covariance, treated as 0 below rounding noise
+        var_t = n * self._sxx - self._sx * self._sx
+        var_v = n * self._syy - self._sy * self._sy
+        cov = n * self._sxy - self._sx * self._sy
+        has_var_t = var_t > _TREND_EPS * n * self._sxx
+        has_var_v = var_v > _TREND_EPS * n * self._syy
+        slope = cov / var_t if has_var_t else 0.0
 
         # Project 10 minutes ahead
         horizon = self._config.fatigue_horizon_min
-        current = values[-1]
-        predicted = float(np.clip(current + slope * horizon, 0, 100))
+        current = history[-1][1]
+        predicted = min(max(current + slope * horizon, 0.0), 100.0)
 
         # Confidence based on R² and data span
-        predicted_line = np.polyval(coeffs, t_min)
-        ss_res = np.sum((values - predicted_line) ** 2)
-        ss_tot = np.sum((values - np.mean(values)) ** 2)
-        r_squared = 1 - ss_res / ss_tot if ss_tot > 0 else 0.0
-        data_span_min = t_min[-1]
+        r_squared = cov * cov / (var_t * var_v) if has_var_t and has_var_v else 0.0
+        data_span_min = (history[-1][0] - history[0][0]) / 60.0
         span_factor = min(data_span_min / 5.0, 1.0)
-        confidence = float(np.clip(r_squared * span_factor, 0, 1))
+        confidence = min(max(r_squared * span_factor, 0.0), 1.0)
 
         return FatigueTrend(
             slope=slope,
@@ -154,3 +188,4 @@ class CognitiveInference:
     def reset(self):
         self._prev_scores = None
         self._fatigue_history.clear()
+        self._rebase_trend()
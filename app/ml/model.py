@@ -8,6 +8,7 @@ When no trained model is available, uses a rule-based heuristic
 based on established HRV-cognition relationships from literature.
 """
 
+import functools
 import logging
 import os
 from dataclasses import dataclass
@@ -17,7 +18,12 @@ import numpy as np
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+def _clip(x: float, lo: float, hi: float) -> float:
+    """Scalar np.clip without the ufunc dispatch."""
+    return lo if x < lo else hi if x > hi else x
+
+
+@dataclass(slots=True)
 class CognitiveScores:
     stress: float         # 0–100
     cognitive_load: float  # 0–100
@@ -42,6 +48,8 @@ class CognitiveModel:
     def __init__(self, model_path: str, scaler_path: str):
         self._model = None
         self._scaler = None
+        self._scaler_mean: np.ndarray | None = None
+        self._scaler_scale: np.ndarray | None = None
         self._use_heuristic = True
 
         if os.path.exists(model_path) and os.path.exists(scaler_path):
@@ -50,12 +58,30 @@ class CognitiveModel:
                 self._model = joblib.load(model_path)
                 self._scaler = joblib.load(scaler_path)
                 self._use_heuristic = False
+                self._prepare_fast_path()
                 logger.info("Loaded trained model from %s", model_path)
             except Exception as e:
                 logger.warning("Failed to load model, using heuristic: %s", e)
         else:
             logger.info("No trained model found, using heuristic mode")
 
+    def _prepare_fast_path(self):
+        """Precompute what per-window prediction would otherwise redo.
+
+        A centering-and-scaling StandardScaler is applied as plain array
+        math, skipping transform()'s input validation; other scalers keep
+        going through transform(). Estimators that parallelize are pinned
+        to one job, a thread pool only costs time on a single sample.
+        """
+        scaler = self._scaler
+        if (getattr(scaler, "with_mean", False) and getattr(scaler, "with_std", False)
+                and getattr(scaler, "mean_", None) is not None
+                and getattr(scaler, "scale_", None) is not None):
+            self._scaler_mean = np.asarray(scaler.mean_, dtype=np.float64)
+            self._scaler_scale = np.asarray(scaler.scale_, dtype=np.float64)
+        if getattr(self._model, "n_jobs", None) not in (None, 1):
+            self._model.n_jobs = 1
+
     @property
     def is_heuristic(self) -> bool:
         return self._use_heuristic
@@ -68,7 +94,10 @@ class CognitiveModel:
     def _model_predict(self, features: np.ndarray) -> CognitiveScores:
         try:
             X = features.reshape(1, -1)
-            X_scaled = self._scaler.transform(X)
+            if self._scaler_mean is not None:
+                X_scaled = (X - self._scaler_mean) / self._scaler_scale
+            else:
+                X_scaled = self._scaler.transform(X)
             predictions = self._model.predict(X_scaled)
 
             # Model outputs [stress, cognitive_load, fatigue]
@@ -91,34 +120,43 @@ class CognitiveModel:
         """
         # Feature vector order: [mean_hr, mean_rr, sdnn, rmssd, pnn50, sdsd,
         #   cv_rr, lf_power, hf_power, lf_hf_ratio, total_power, sd1, sd2, sd_ratio]
-        mean_hr = features[0]
-        sdnn = features[2]
-        rmssd = features[3]
-        pnn50 = features[4]
-        lf_hf = features[9]
-        sd1 = features[11]
+        mean_hr = float(features[0])
+        sdnn = float(features[2])
+        rmssd = float(features[3])
+        pnn50 = float(features[4])
+        lf_hf = float(features[9])
+        sd1 = float(features[11])
 
         # Stress: driven by sympathetic activation
         # High LF/HF (>2.0) and low RMSSD (<30ms) indicate stress
-        stress_lf = np.clip((lf_hf - 0.5) / 4.0 * 100, 0, 100)
-        stress_rmssd = np.clip((1 - rmssd / 80.0) * 100, 0, 100)
-        stress_hr = np.clip((mean_hr - 60) / 50.0 * 60, 0, 100)
+        stress_lf = _clip((lf_hf - 0.5) / 4.0 * 100, 0, 100)
+        stress_rmssd = _clip((1 - rmssd / 80.0) * 100, 0, 100)
+        stress_hr = _clip((mean_hr - 60) / 50.0 * 60, 0, 100)
         stress = 0.4 * stress_lf + 0.4 * stress_rmssd + 0.2 * stress_hr
 
         # Cognitive load: reduced HRV + elevated HR
-        load_sdnn = np.clip((1 - sdnn / 100.0) * 100, 0, 100)
-        load_hr = np.clip((mean_hr - 55) / 55.0 * 80, 0, 100)
-        load_sd1 = np.clip((1 - sd1 / 50.0) * 100, 0, 100)
+        load_sdnn = _clip((1 - sdnn / 100.0) * 100, 0, 100)
+        load_hr = _clip((mean_hr - 55) / 55.0 * 80, 0, 100)
+        load_sd1 = _clip((1 - sd1 / 50.0) * 100, 0, 100)
         cognitive_load = 0.35 * load_sdnn + 0.35 * load_hr + 0.3 * load_sd1
 
         # Fatigue: parasympathetic withdrawal pattern
-        fatigue_rmssd = np.clip((1 - rmssd / 60.0) * 80, 0, 100)
-        fatigue_pnn50 = np.clip((1 - pnn50 / 30.0) * 80, 0, 100)
-        fatigue_hr = np.clip((mean_hr - 65) / 40.0 * 50, 0, 100)
+        fatigue_rmssd = _clip((1 - rmssd / 60.0) * 80, 0, 100)
+        fatigue_pnn50 = _clip((1 - pnn50 / 30.0) * 80, 0, 100)
+        fatigue_hr = _clip((mean_hr - 65) / 40.0 * 50, 0, 100)
         fatigue = 0.4 * fatigue_rmssd + 0.35 * fatigue_pnn50 + 0.25 * fatigue_hr
 
         return CognitiveScores(
-            stress=float(np.clip(stress, 0, 100)),
-            cognitive_load=float(np.clip(cognitive_load, 0, 100)),
-            fatigue=float(np.clip(fatigue, 0, 100)),
+            stress=_clip(stress, 0.0, 100.0),
+            cognitive_load=_clip(cognitive_load, 0.0, 100.0),
+            fatigue=_clip(fatigue, 0.0, 100.0),
         )
+
+
+@functools.lru_cache(maxsize=None)
+def load_model(model_path: str, scaler_path: str) -> CognitiveModel:
+    """Shared CognitiveModel per model/scaler pair, deserialized once per process.
+
+    Safe to share: prediction keeps no per-session state.
+    """
+    return CognitiveModel(model_path, scaler_path)
@@ -15,7 +15,7 @@ from app.config.settings import SignalConfig
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class CleanedPPI:
     timestamps: np.ndarray
     intervals_ms: np.ndarray
@@ -30,7 +30,7 @@ class PPICleaner:
         self._config = config
 
     def clean(
-        self, ppi_ms: list[int], timestamps: list[float]
+        self, ppi_ms: np.ndarray, timestamps: np.ndarray
     ) -> CleanedPPI:
         if len(ppi_ms) == 0:
             return CleanedPPI(
@@ -42,8 +42,9 @@ class PPICleaner:
                 n_removed=0,
             )
 
-        ppi = np.array(ppi_ms, dtype=np.float64)
-        ts = np.array(timestamps, dtype=np.float64)
+        # No copy for the float64 arrays a WindowData already holds
+        ppi = np.ascontiguousarray(ppi_ms, dtype=np.float64)
+        ts = np.ascontiguousarray(timestamps, dtype=np.float64)
         n_original = len(ppi)
 
         # 1. Physiological range filter
@@ -52,13 +53,10 @@ class PPICleaner:
         # 2. Successive difference filter (ectopic beat detection)
         if len(ppi) > 1:
             diff_ratio = np.abs(np.diff(ppi)) / ppi[:-1]
-            succ_mask = np.ones(len(ppi), dtype=bool)
-            bad_indices = np.where(diff_ratio > self._config.max_ppi_diff_ratio)[0]
-            for idx in bad_indices:
-                succ_mask[idx] = False
-                if idx + 1 < len(succ_mask):
-                    succ_mask[idx + 1] = False
-            mask = mask & succ_mask
+            # A jump between i and i+1 invalidates both samples
+            ok = ~(diff_ratio > self._config.max_ppi_diff_ratio)
+            mask[:-1] &= ok
+            mask[1:] &= ok
 
         n_removed = n_original - int(np.sum(mask))
         quality_ratio = float(np.sum(mask)) / n_original if n_original > 0 else 0.0
@@ -81,15 +79,18 @@ class PPICleaner:
         )
 
     def interpolate(self, cleaned: CleanedPPI) -> np.ndarray:
-        """Interpolate removed samples using cubic interpolation."""
-        if cleaned.n_original == 0 or np.all(cleaned.mask_valid):
-            return cleaned.intervals_ms.copy()
+        """Interpolate removed samples using cubic interpolation.
 
-        valid_idx = np.where(cleaned.mask_valid)[0]
-        invalid_idx = np.where(~cleaned.mask_valid)[0]
+        When nothing was removed the cleaned intervals are returned as-is,
+        without a copy; callers must not mutate the result.
+        """
+        if cleaned.n_removed == 0:
+            return cleaned.intervals_ms
 
+        valid_idx = np.flatnonzero(cleaned.mask_valid)
         if len(valid_idx) < 2:
             return cleaned.intervals_ms.copy()
+        invalid_idx = np.flatnonzero(~cleaned.mask_valid)
 
         result = cleaned.intervals_ms.copy()
         result[invalid_idx] = np.interp(
@@ -7,7 +7,6 @@ complete windows at configurable step intervals.
 
 import logging
 import time
-from collections import deque
 from dataclasses import dataclass, field
 from typing import Callable, Optional
 
@@ -18,7 +17,7 @@ from app.config.settings import SignalConfig
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class WindowData:
     ppi_ms: np.ndarray
     timestamps: np.ndarray
@@ -27,16 +26,16 @@ class WindowData:
     sample_count: int
 
 
-@dataclass
-class _Sample:
-    timestamp: float
-    ppi_ms: int
-
-
 class SlidingWindow:
+    _INITIAL_CAPACITY = 256
+
     def __init__(self, config: SignalConfig):
         self._config = config
-        self._buffer: deque[_Sample] = deque()
+        # Live samples are _ppi[_head:_tail] / _ts[_head:_tail], oldest first
+        self._ppi = np.empty(self._INITIAL_CAPACITY, dtype=np.float64)
+        self._ts = np.empty(self._INITIAL_CAPACITY, dtype=np.float64)
+        self._head = 0
+        self._tail = 0
         self._last_emit_time: float = 0.0
         self._on_window: Optional[Callable[[WindowData], None]] = None
 
@@ -45,43 +44,72 @@ class SlidingWindow:
 
     def add_samples(self, ppi_ms: list[int], timestamp: float):
         """Add new PPI samples. Timestamps are reconstructed from PPI durations."""
-        # Reconstruct timestamps going backward from `timestamp`
-        # then add to buffer in chronological order (oldest first).
-        t = timestamp
-        batch: list[_Sample] = []
-        for ppi in reversed(ppi_ms):
-            batch.append(_Sample(timestamp=t, ppi_ms=ppi))
-            t -= ppi / 1000.0
-        # batch is newest-first → reverse to get oldest-first
-        for s in reversed(batch):
-            self._buffer.append(s)
+        # The newest sample ends at `timestamp`; each older one ends the
+        # summed durations of the samples after it earlier (oldest first).
+        ppi = np.asarray(ppi_ms, dtype=np.float64)
+        if ppi.size:
+            elapsed = np.cumsum(ppi / 1000.0)
+            self._append(ppi, timestamp - (elapsed[-1] - elapsed))
 
         self._evict_old()
 
         # Debug: show buffer state (debug level to reduce I/O)
-        span = self.buffer_duration_sec
-        needed = self._config.window_size_sec * 0.8
-        logger.debug("Buffer: %d samples, span=%.1fs / needed=%.1fs",
-                      len(self._buffer), span, needed)
+        if logger.isEnabledFor(logging.DEBUG):
+            span = self.buffer_duration_sec
+            needed = self._config.window_size_sec * 0.8
+            logger.debug("Buffer: %d samples, span=%.1fs / needed=%.1fs",
+                          self.sample_count, span, needed)
 
         self._try_emit()
 
+    def _append(self, ppi_ms, timestamps):
+        n = len(ppi_ms)
+        if self._tail + n > len(self._ppi):
+            self._make_room(n)
+        self._ppi[self._tail:self._tail + n] = ppi_ms
+        self._ts[self._tail:self._tail + n] = timestamps
+        self._tail += n
+
+    def _make_room(self, n: int):
+        """Move live samples to the front, growing the arrays if n won't fit."""
+        live = self._tail - self._head
+        capacity = len(self._ppi)
+        if live + n > capacity:
+            capacity = max(2 * capacity, live + n)
+            ppi = np.empty(capacity, dtype=np.float64)
+            ts = np.empty(capacity, dtype=np.float64)
+        else:
+            ppi, ts = self._ppi, self._ts
+        ppi[:live] = self._ppi[self._head:self._tail]
+        ts[:live] = self._ts[self._head:self._tail]
+        self._ppi, self._ts = ppi, ts
+        self._head, self._tail = 0, live
+
     def _evict_old(self):
-        if not self._buffer:
+        if self._head == self._tail:
+            return
+        live_ts = self._ts[self._head:self._tail]
+        cutoff = live_ts[-1] - self._config.window_size_sec
+        # Drop the leading run of samples older than the cutoff
+        stale = live_ts < cutoff
+        if not stale[0]:
             return
-        cutoff = self._buffer[-1].timestamp - self._config.window_size_sec
-        while self._buffer and self._buffer[0].timestamp < cutoff:
-            self._buffer.popleft()
+        if stale.all():
+            self._head = self._tail = 0
+        else:
+            self._head += int(np.argmin(stale))
 
     def _try_emit(self):
         now = time.time()
         if now - self._last_emit_time < self._config.window_step_sec:
             return
 
-        if not self._buffer:
+        if self._head == self._tail:
             return
 
-        span = self._buffer[-1].timestamp - self._buffer[0].timestamp
+        window_start = float(self._ts[self._head])
+        window_end = float(self._ts[self._tail - 1])
+        span = window_end - window_start
         # First emission: accept with only 5s of data (~30%) for fast start.
         # After that: require 60% fill for quality.
         # With 15s window: first at ~5s, then need ~9s of data.
@@ -90,11 +118,11 @@ class SlidingWindow:
             return
 
         window = WindowData(
-            ppi_ms=np.array([s.ppi_ms for s in self._buffer], dtype=np.float64),
-            timestamps=np.array([s.timestamp for s in self._buffer]),
-            window_start=self._buffer[0].timestamp,
-            window_end=self._buffer[-1].timestamp,
-            sample_count=len(self._buffer),
+            ppi_ms=self._ppi[self._head:self._tail].copy(),
+            timestamps=self._ts[self._head:self._tail].copy(),
+            window_start=window_start,
+            window_end=window_end,
+            sample_count=self._tail - self._head,
         )
 
         self._last_emit_time = now
@@ -102,15 +130,15 @@ class SlidingWindow:
             self._on_window(window)
 
     def reset(self):
-        self._buffer.clear()
+        self._head = self._tail = 0
         self._last_emit_time = 0.0
 
     @property
     def buffer_duration_sec(self) -> float:
-        if len(self._buffer) < 2:
+        if self._tail - self._head < 2:
             return 0.0
-        return self._buffer[-1].timestamp - self._buffer[0].timestamp
+        return float(self._ts[self._tail - 1] - self._ts[self._head])
 
     @property
     def sample_count(self) -> int:
-        return len(self._buffer)
+        return self._tail - self._head
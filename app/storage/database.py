@@ -2,11 +2,18 @@
 SQLite database layer for persistent storage of sessions and data points.
 """
 
+import functools
 import logging
+import operator
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
-from typing import Optional
+from datetime import date
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from app.domain.types import DataPoint
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +21,7 @@ SCHEMA = """
 CREATE TABLE IF NOT EXISTS sessions (
     id TEXT PRIMARY KEY,
     start_time REAL NOT NULL,
+    start_day TEXT NOT NULL,  -- local date of start_time, YYYY-MM-DD
     end_time REAL,
     activity_type TEXT NOT NULL DEFAULT 'other',
     status TEXT NOT NULL DEFAULT 'active',
@@ -38,7 +46,7 @@ CREATE TABLE IF NOT EXISTS data_points (
     window_quality REAL,
     fatigue_slope REAL,
     fatigue_predicted REAL,
-    FOREIGN KEY (session_id) REFERENCES sessions(id)
+    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
 );
 
 CREATE TABLE IF NOT EXISTS session_summaries (
@@ -55,55 +63,263 @@ CREATE TABLE IF NOT EXISTS session_summaries (
     time_overload_pct REAL,
     time_recovery_pct REAL,
     feedback TEXT,
-    FOREIGN KEY (session_id) REFERENCES sessions(id)
+    FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
+);
+
+-- Plain session_id lookups use idx_data_points_timestamp's prefix
+DROP INDEX IF EXISTS idx_data_points_session;
+-- Per-day running aggregates of data_points, keyed by the session's
+-- start_day and maintained by insert_data_points / delete_session
+CREATE TABLE IF NOT EXISTS daily_stats (
+    day TEXT PRIMARY KEY,
+    n INTEGER NOT NULL,
+    n_stress INTEGER NOT NULL,
+    sum_stress REAL NOT NULL,
+    n_cognitive_load INTEGER NOT NULL,
+    sum_cognitive_load REAL NOT NULL,
+    n_fatigue INTEGER NOT NULL,
+    sum_fatigue REAL NOT NULL,
+    n_hr INTEGER NOT NULL,
+    sum_hr REAL NOT NULL,
+    overload_count INTEGER NOT NULL
 );
 
-CREATE INDEX IF NOT EXISTS idx_data_points_session
-    ON data_points(session_id);
 CREATE INDEX IF NOT EXISTS idx_data_points_timestamp
     ON data_points(session_id, timestamp);
 CREATE INDEX IF NOT EXISTS idx_sessions_start
     ON sessions(start_time);
 """
 
+DATA_POINT_COLUMNS = (
+    "timestamp", "hr", "rmssd", "sdnn", "pnn50", "mean_rr",
+    "lf_power", "hf_power", "lf_hf_ratio",
+    "stress", "cognitive_load", "fatigue",
+    "window_quality", "fatigue_slope", "fatigue_predicted",
+)
+
+# DataPoint -> its values in DATA_POINT_COLUMNS order, in one C call
+_data_point_values = operator.attrgetter(*DATA_POINT_COLUMNS)
+
+SUMMARY_COLUMNS = (
+    "session_id", "duration_sec", "avg_hr", "avg_rmssd",
+    "avg_stress", "avg_cognitive_load", "avg_fatigue",
+    "max_stress", "max_cognitive_load", "max_fatigue",
+    "time_overload_pct", "time_recovery_pct", "feedback",
+)
+
+
+# Write statements, kept as constants so each one is parsed once and then
+# served from the connection's statement cache
+INSERT_SESSION_SQL = (
+    "INSERT INTO sessions (id, start_time, start_day, activity_type, status) "
+    "VALUES (?, ?, ?, ?, 'active')"
+)
+INSERT_DATA_POINT_SQL = (
+    f"INSERT INTO data_points (session_id, {', '.join(DATA_POINT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * (len(DATA_POINT_COLUMNS) + 1))})"
+)
+SAVE_SUMMARY_SQL = (
+    f"INSERT INTO session_summaries ({', '.join(SUMMARY_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(SUMMARY_COLUMNS))}) "
+    f"ON CONFLICT(session_id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in SUMMARY_COLUMNS[1:])
+)
+
+# Adds :sign times the aggregates of a session's data points with id above
+# :min_id to daily_stats (sign -1 removes a deleted session's share)
+UPDATE_DAILY_STATS_SQL = """
+INSERT INTO daily_stats (day, n, n_stress, sum_stress,
+                         n_cognitive_load, sum_cognitive_load,
+                         n_fatigue, sum_fatigue, n_hr, sum_hr, overload_count)
+SELECT s.start_day,
+       :sign * COUNT(*),
+       :sign * COUNT(dp.stress), :sign * TOTAL(dp.stress),
+       :sign * COUNT(dp.cognitive_load), :sign * TOTAL(dp.cognitive_load),
+       :sign * COUNT(dp.fatigue), :sign * TOTAL(dp.fatigue),
+       :sign * COUNT(dp.hr), :sign * TOTAL(dp.hr),
+       :sign * TOTAL(dp.cognitive_load > 70)
+FROM data_points dp JOIN sessions s ON s.id = dp.session_id
+WHERE dp.session_id = :session_id AND dp.id > :min_id
+GROUP BY s.start_day
+ON CONFLICT(day) DO UPDATE SET
+    n = n + excluded.n,
+    n_stress = n_stress + excluded.n_stress,
+    sum_stress = sum_stress + excluded.sum_stress,
+    n_cognitive_load = n_cognitive_load + excluded.n_cognitive_load,
+    sum_cognitive_load = sum_cognitive_load + excluded.sum_cognitive_load,
+    n_fatigue = n_fatigue + excluded.n_fatigue,
+    sum_fatigue = sum_fatigue + excluded.sum_fatigue,
+    n_hr = n_hr + excluded.n_hr,
+    sum_hr = sum_hr + excluded.sum_hr,
+    overload_count = overload_count + excluded.overload_count
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def _ensure_dir(path: str):
+    """Create path once per process; repeat calls skip the stat."""
+    os.makedirs(path, exist_ok=True)
+
 
 class Database:
     def __init__(self, db_path: str):
         self._db_path = db_path
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        _ensure_dir(os.path.dirname(db_path))
+        # One long-lived connection shared by all threads; _lock serializes
+        # access and write transactions are explicit, see _transaction().
+        self._conn = self._open()
+        self._lock = threading.RLock()
         self._init_db()
 
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._db_path, check_same_thread=False, isolation_level=None,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        # WAL only needs syncing at checkpoints; a power cut can lose the
+        # last transaction but never corrupts the database
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
     def _init_db(self):
-        with self._connect() as conn:
-            conn.executescript(SCHEMA)
-            logger.info("Database initialized at %s", self._db_path)
+        with self._lock:
+            legacy = self._detach_tables_without_cascade()
+            self._conn.executescript(SCHEMA)
+            if legacy:
+                self._reattach_tables(legacy)
+            with self._transaction() as conn:
+                self._migrate(conn)
+        logger.info("Database initialized at %s", self._db_path)
+
+    def _detach_tables_without_cascade(self) -> list[str]:
+        """Rename child tables whose session foreign key does not cascade.
+
+        SQLite cannot alter a constraint, so older tables are moved aside
+        (with their indexes dropped) for SCHEMA to recreate them and
+        _reattach_tables() to copy the rows back. Foreign keys stay off
+        until then, as the rebuild procedure requires.
+        """
+        legacy = [
+            table for table in ("data_points", "session_summaries")
+            if any(fk["on_delete"] != "CASCADE" for fk in
+                   self._conn.execute(f"PRAGMA foreign_key_list({table})"))
+        ]
+        if not legacy:
+            return legacy
+        self._conn.execute("PRAGMA foreign_keys=OFF")
+        with self._transaction() as conn:
+            for table in legacy:
+                indexes = [r[0] for r in conn.execute(
+                    """SELECT name FROM sqlite_master
+                       WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL""",
+                    (table,),
+                )]
+                for index in indexes:
+                    conn.execute(f"DROP INDEX {index}")
+                conn.execute(f"ALTER TABLE {table} RENAME TO _{table}_old")
+        return legacy
+
+    def _reattach_tables(self, legacy: list[str]):
+        columns = {
+            "data_points": ("id", "session_id") + DATA_POINT_COLUMNS,
+            "session_summaries": SUMMARY_COLUMNS,
+        }
+        with self._transaction() as conn:
+            for table in legacy:
+                cols = ", ".join(columns[table])
+                conn.execute(
+                    f"INSERT INTO {table} ({cols}) SELECT {cols} FROM _{table}_old"
+                )
+                conn.execute(f"DROP TABLE _{table}_old")
+                logger.info("Migrated %s: session foreign key now cascades", table)
+        self._conn.execute("PRAGMA foreign_keys=ON")
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Bring databases created by older versions up to SCHEMA."""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "start_day" not in columns:
+            conn.execute(
+                "ALTER TABLE sessions ADD COLUMN start_day TEXT NOT NULL DEFAULT ''"
+            )
+            conn.execute(
+                """UPDATE sessions
+                   SET start_day = date(start_time, 'unixepoch', 'localtime')"""
+            )
+            logger.info("Migrated sessions table: added start_day")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_day ON sessions(start_day)"
+        )
+        # Aggregates now come from daily_stats; the covering index only
+        # slowed inserts down
+        conn.execute("DROP INDEX IF EXISTS idx_data_points_metrics")
+        needs_backfill = conn.execute(
+            """SELECT NOT EXISTS (SELECT 1 FROM daily_stats)
+                      AND EXISTS (SELECT 1 FROM data_points)"""
+        ).fetchone()[0]
+        if needs_backfill:
+            session_ids = [r[0] for r in conn.execute(
+                "SELECT DISTINCT session_id FROM data_points"
+            )]
+            for session_id in session_ids:
+                conn.execute(
+                    UPDATE_DAILY_STATS_SQL,
+                    {"sign": 1, "session_id": session_id, "min_id": 0},
+                )
+            logger.info("Backfilled daily_stats from %d sessions", len(session_ids))
 
     @contextmanager
     def _connect(self):
-        conn = sqlite3.connect(self._db_path)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA foreign_keys=ON")
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        """Shared connection for reads: each statement runs in autocommit."""
+        with self._lock:
+            yield self._conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run a block of writes in one BEGIN IMMEDIATE transaction.
+
+        Re-entrant: a nested block joins the enclosing transaction.
+        """
+        with self._lock:
+            conn = self._conn
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
 
     # --- Sessions ---
 
     def create_session(self, session_id: str, start_time: float, activity_type: str):
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.execute(
-                "INSERT INTO sessions (id, start_time, activity_type, status) VALUES (?, ?, ?, 'active')",
-                (session_id, start_time, activity_type),
+                INSERT_SESSION_SQL,
+                (
+                    session_id,
+                    start_time,
+                    date.fromtimestamp(start_time).isoformat(),
+                    activity_type,
+                ),
             )
 
     def end_session(self, session_id: str, end_time: float):
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.execute(
                 "UPDATE sessions SET end_time = ?, status = 'completed' WHERE id = ?",
                 (end_time, session_id),
@@ -124,52 +340,50 @@ class Database:
             ).fetchall()
             return [dict(r) for r in rows]
 
-    def get_sessions_for_date(self, date_str: str) -> list[dict]:
-        """Get sessions for a specific date (YYYY-MM-DD)."""
+    def list_sessions_with_summaries(self, limit: int = 50, offset: int = 0) -> list[dict]:
+        """Like list_sessions(), with each session's summary (or None) attached."""
         with self._connect() as conn:
             rows = conn.execute(
-                """SELECT * FROM sessions
-                   WHERE date(start_time, 'unixepoch', 'localtime') = ?
-                   ORDER BY start_time""",
-                (date_str,),
+                """SELECT s.*, ss.*
+                   FROM sessions s
+                   LEFT JOIN session_summaries ss ON ss.session_id = s.id
+                   ORDER BY s.start_time DESC LIMIT ? OFFSET ?""",
+                (limit, offset),
             ).fetchall()
-            return [dict(r) for r in rows]
+
+        sessions = []
+        for r in rows:
+            session = dict(r)
+            summary = {k: session.pop(k) for k in SUMMARY_COLUMNS}
+            session["summary"] = summary if summary["session_id"] is not None else None
+            sessions.append(session)
+        return sessions
 
     def delete_session(self, session_id: str):
-        with self._connect() as conn:
-            conn.execute("DELETE FROM data_points WHERE session_id = ?", (session_id,))
-            conn.execute("DELETE FROM session_summaries WHERE session_id = ?", (session_id,))
+        with self._transaction() as conn:
+            conn.execute(
+                UPDATE_DAILY_STATS_SQL,
+                {"sign": -1, "session_id": session_id, "min_id": 0},
+            )
+            conn.execute("DELETE FROM daily_stats WHERE n <= 0")
+            # Data points and the summary go with it (ON DELETE CASCADE)
             conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
 
     # --- Data Points ---
 
-    def insert_data_point(self, session_id: str, data: dict):
-        with self._connect() as conn:
+    def insert_data_points(self, session_id: str, points: Iterable["DataPoint"]):
+        """Insert a batch of data points and fold it into daily_stats, in one transaction."""
+        with self._transaction() as conn:
+            (last_id,) = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM data_points"
+            ).fetchone()
+            conn.executemany(
+                INSERT_DATA_POINT_SQL,
+                ((session_id, *_data_point_values(p)) for p in points),
+            )
             conn.execute(
-                """INSERT INTO data_points
-                   (session_id, timestamp, hr, rmssd, sdnn, pnn50, mean_rr,
-                    lf_power, hf_power, lf_hf_ratio,
-                    stress, cognitive_load, fatigue,
-                    window_quality, fatigue_slope, fatigue_predicted)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    session_id,
-                    data.get("timestamp", 0),
-                    data.get("hr"),
-                    data.get("rmssd"),
-                    data.get("sdnn"),
-                    data.get("pnn50"),
-                    data.get("mean_rr"),
-                    data.get("lf_power"),
-                    data.get("hf_power"),
-                    data.get("lf_hf_ratio"),
-                    data.get("stress"),
-                    data.get("cognitive_load"),
-                    data.get("fatigue"),
-                    data.get("window_quality"),
-                    data.get("fatigue_slope"),
-                    data.get("fatigue_predicted"),
-                ),
+                UPDATE_DAILY_STATS_SQL,
+                {"sign": 1, "session_id": session_id, "min_id": last_id},
             )
 
     def get_session_data(self, session_id: str) -> list[dict]:
@@ -180,32 +394,104 @@ class Database:
             ).fetchall()
             return [dict(r) for r in rows]
 
+    def iter_session_data(
+        self, session_id: str, batch_size: int = 4096
+    ) -> Iterator[list[tuple]]:
+        """Yield data points in batches of plain tuples, DATA_POINT_COLUMNS order.
+
+        Streams on its own short-lived connection (WAL allows concurrent
+        readers) so a slow consumer does not hold the shared connection.
+        """
+        conn = self._open()
+        conn.row_factory = None
+        try:
+            cursor = conn.execute(
+                f"""SELECT {", ".join(DATA_POINT_COLUMNS)} FROM data_points
+                    WHERE session_id = ? ORDER BY timestamp""",
+                (session_id,),
+            )
+            while batch := cursor.fetchmany(batch_size):
+                yield batch
+        finally:
+            conn.close()
+
+    def get_critical_periods(
+        self, session_id: str, overload_threshold: float, fatigue_threshold: float,
+        recovery_stress_threshold: float, recovery_fatigue_threshold: float,
+        min_duration_sec: float = 30.0,
+    ) -> list[dict]:
+        """Overload, recovery and prolonged-fatigue periods of a session.
+
+        Gaps-and-islands over the rows where the metric is present: each
+        inactive row closes the run of active rows before it, and the period
+        ends at that row's timestamp. A threshold period still open at the
+        end of the session is closed at the last data point; an open
+        recovery period is dropped.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                """WITH points AS (
+                       SELECT id, timestamp AS ts, stress, cognitive_load, fatigue
+                       FROM data_points WHERE session_id = :session_id
+                   ),
+                   marked AS (
+                       SELECT 0 AS kind, 'overload' AS period_type, id, ts,
+                              cognitive_load AS val,
+                              cognitive_load > :overload AS active
+                       FROM points WHERE cognitive_load IS NOT NULL
+                       UNION ALL
+                       SELECT 1, 'recovery', id, ts, NULL,
+                              stress < :recovery_stress AND fatigue < :recovery_fatigue
+                       FROM points WHERE stress IS NOT NULL AND fatigue IS NOT NULL
+                       UNION ALL
+                       SELECT 2, 'prolonged_fatigue', id, ts, fatigue,
+                              fatigue > :fatigue
+                       FROM points WHERE fatigue IS NOT NULL
+                   ),
+                   grouped AS (
+                       SELECT kind, period_type, ts, val, active,
+                              COALESCE(SUM(NOT active) OVER (
+                                  PARTITION BY kind ORDER BY ts, id
+                                  ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                              ), 0) AS grp
+                       FROM marked
+                   ),
+                   runs AS (
+                       SELECT kind, period_type,
+                              MIN(ts) AS start_timestamp,
+                              CASE WHEN MAX(NOT active) THEN MAX(ts)
+                                   ELSE (SELECT MAX(ts) FROM points)
+                              END AS end_timestamp,
+                              AVG(CASE WHEN active THEN val END) AS avg_val
+                       FROM grouped
+                       GROUP BY kind, grp
+                       HAVING SUM(active) > 0
+                          AND (MAX(NOT active) OR kind != 1)
+                   )
+                   SELECT start_timestamp, end_timestamp, period_type,
+                          COALESCE(ROUND(avg_val, 1), 0.0) AS avg_score,
+                          ROUND(end_timestamp - start_timestamp, 1) AS duration_sec
+                   FROM runs
+                   WHERE end_timestamp - start_timestamp >= :min_duration
+                   ORDER BY start_timestamp, kind""",
+                {
+                    "session_id": session_id,
+                    "overload": overload_threshold,
+                    "fatigue": fatigue_threshold,
+                    "recovery_stress": recovery_stress_threshold,
+                    "recovery_fatigue": recovery_fatigue_threshold,
+                    "min_duration": min_duration_sec,
+                },
+            ).fetchall()
+            return [dict(r) for r in rows]
+
     # --- Summaries ---
 
     def save_summary(self, session_id: str, summary: dict):
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.execute(
-                """INSERT OR REPLACE INTO session_summaries
-                   (session_id, duration_sec, avg_hr, avg_rmssd,
-                    avg_stress, avg_cognitive_load, avg_fatigue,
-                    max_stress, max_cognitive_load, max_fatigue,
-                    time_overload_pct, time_recovery_pct, feedback)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    session_id,
-                    summary.get("duration_sec"),
-                    summary.get("avg_hr"),
-                    summary.get("avg_rmssd"),
-                    summary.get("avg_stress"),
-                    summary.get("avg_cognitive_load"),
-                    summary.get("avg_fatigue"),
-                    summary.get("max_stress"),
-                    summary.get("max_cognitive_load"),
-                    summary.get("max_fatigue"),
-                    summary.get("time_overload_pct"),
-                    summary.get("time_recovery_pct"),
-                    summary.get("feedback"),
-                ),
+                SAVE_SUMMARY_SQL,
+                (session_id, *(summary.get(k) for k in SUMMARY_COLUMNS[1:])),
             )
 
     def get_summary(self, session_id: str) -> Optional[dict]:
@@ -218,39 +504,48 @@ class Database:
 
     # --- Analytics ---
 
-    def get_daily_averages(self, date_str: str) -> Optional[dict]:
+    def get_daily_digests_range(self, start_date: str, end_date: str) -> list[dict]:
+        """Daily averages and session counts for each day with data, newest first.
+
+        Days are the local dates of session start times, inclusive on both ends.
+        Averages are rounded to one decimal, 0 when a metric has no values.
+        """
         with self._connect() as conn:
-            row = conn.execute(
+            rows = conn.execute(
                 """SELECT
-                       AVG(stress) as avg_stress,
-                       AVG(cognitive_load) as avg_cognitive_load,
-                       AVG(fatigue) as avg_fatigue,
-                       AVG(hr) as avg_hr,
-                       AVG(rmssd) as avg_rmssd,
-                       COUNT(*) as data_point_count
-                   FROM data_points dp
-                   JOIN sessions s ON dp.session_id = s.id
-                   WHERE date(s.start_time, 'unixepoch', 'localtime') = ?""",
-                (date_str,),
-            ).fetchone()
-            return dict(row) if row and row["data_point_count"] > 0 else None
+                       day,
+                       COALESCE(ROUND(sum_stress / n_stress, 1), 0) as avg_stress,
+                       COALESCE(ROUND(sum_cognitive_load / n_cognitive_load, 1), 0)
+                           as avg_cognitive_load,
+                       COALESCE(ROUND(sum_fatigue / n_fatigue, 1), 0) as avg_fatigue,
+                       COALESCE(ROUND(sum_hr / n_hr, 1), 0) as avg_hr,
+                       (SELECT COUNT(*) FROM sessions s WHERE s.start_day = day)
+                           as session_count
+                   FROM daily_stats
+                   WHERE day BETWEEN ? AND ? AND n > 0
+                   ORDER BY day DESC""",
+                (start_date, end_date),
+            ).fetchall()
+            return [dict(r) for r in rows]
+
+    def get_daily_digest_row(self, date_str: str) -> Optional[dict]:
+        """Averages and session count for one day (YYYY-MM-DD), or None without data."""
+        rows = self.get_daily_digests_range(date_str, date_str)
+        return rows[0] if rows else None
 
     def get_weekly_stats(self, end_date: str) -> list[dict]:
         """Get daily averages for the 7 days ending at end_date."""
         with self._connect() as conn:
             rows = conn.execute(
                 """SELECT
-                       date(s.start_time, 'unixepoch', 'localtime') as day,
-                       AVG(dp.stress) as avg_stress,
-                       AVG(dp.cognitive_load) as avg_cognitive_load,
-                       AVG(dp.fatigue) as avg_fatigue,
-                       AVG(dp.hr) as avg_hr,
-                       SUM(CASE WHEN dp.cognitive_load > 70 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as overload_pct
-                   FROM data_points dp
-                   JOIN sessions s ON dp.session_id = s.id
-                   WHERE date(s.start_time, 'unixepoch', 'localtime')
-                         BETWEEN date(?, '-6 days') AND ?
-                   GROUP BY day
+                       day,
+                       sum_stress / n_stress as avg_stress,
+                       sum_cognitive_load / n_cognitive_load as avg_cognitive_load,
+                       sum_fatigue / n_fatigue as avg_fatigue,
+                       sum_hr / n_hr as avg_hr,
+                       overload_count * 100.0 / n as overload_pct
+                   FROM daily_stats
+                   WHERE day BETWEEN date(?, '-6 days') AND ? AND n > 0
                    ORDER BY day""",
                 (end_date, end_date),
             ).fetchall()
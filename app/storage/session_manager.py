@@ -6,20 +6,33 @@ data persistence and CSV/summary export.
 """
 
 import csv
+import io
+import itertools
 import logging
 import os
+import secrets
+import threading
 import time
-import uuid
-from dataclasses import dataclass, field
-from typing import Optional
+from dataclasses import dataclass
+from datetime import date
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional
+
+import numpy as np
 
 from app.config.settings import StorageConfig
-from app.storage.database import Database
+from app.storage.database import DATA_POINT_COLUMNS, Database
+
+if TYPE_CHECKING:
+    from app.domain.types import DataPoint
 
 logger = logging.getLogger(__name__)
 
 ACTIVITY_TYPES = ["travail", "etude", "repos", "autre"]
 
+# Data points are written in batches: whichever limit is hit first
+FLUSH_MAX_POINTS = 10
+FLUSH_MAX_AGE_SEC = 5.0
+
 
 @dataclass
 class SessionInfo:
@@ -30,6 +43,11 @@ class SessionInfo:
     status: str = "active"
     data_point_count: int = 0
 
+    @property
+    def start_day(self) -> str:
+        """Local calendar day (YYYY-MM-DD) the session is filed under."""
+        return date.fromtimestamp(self.start_time).isoformat()
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -42,13 +60,60 @@ class SessionInfo:
         }
 
 
+class _SummaryColumns:
+    """Metrics of the active session's points, kept in memory for the summary.
+
+    One float64 row per point in SUMMARY_METRICS order, grown by doubling.
+    aggregates() skips missing (NaN) values in averages and maxima, which
+    are 0 for a metric without values; NaN never meets a threshold.
+    """
+
+    SUMMARY_METRICS = ("hr", "rmssd", "stress", "cognitive_load", "fatigue")
+
+    def __init__(self, capacity: int = 1024):
+        self._data = np.empty((capacity, len(self.SUMMARY_METRICS)))
+        self._n = 0
+
+    def reset(self):
+        self._n = 0
+
+    def append(self, point: "DataPoint"):
+        if self._n == len(self._data):
+            self._data = np.concatenate((self._data, np.empty_like(self._data)))
+        self._data[self._n] = (
+            point.hr, point.rmssd, point.stress, point.cognitive_load, point.fatigue
+        )
+        self._n += 1
+
+    def aggregates(self) -> dict:
+        cols = dict(zip(self.SUMMARY_METRICS, self._data[:self._n].T))
+        present = {key: col[~np.isnan(col)] for key, col in cols.items()}
+        agg = {"n": self._n}
+        for key, vals in present.items():
+            agg[f"avg_{key}"] = float(vals.mean()) if vals.size else 0.0
+        for key in ("stress", "cognitive_load", "fatigue"):
+            vals = present[key]
+            agg[f"max_{key}"] = float(vals.max()) if vals.size else 0.0
+        agg["overload_count"] = int(np.count_nonzero(cols["cognitive_load"] > 70))
+        agg["recovery_count"] = int(np.count_nonzero(
+            (cols["stress"] < 30) & (cols["fatigue"] < 30)
+        ))
+        return agg
+
+
 class SessionManager:
     def __init__(self, config: StorageConfig, db: Database):
         self._config = config
         self._db = db
         self._active_session: Optional[SessionInfo] = None
+        self._on_session_stopped: Optional[Callable[[SessionInfo], None]] = None
+        # Socket handlers and the flush timer run on separate threads;
+        # _pending_lock guards the buffer and the active session switch.
+        self._pending_lock = threading.Lock()
+        self._pending: list["DataPoint"] = []
+        self._flush_timer: Optional[threading.Timer] = None
+        self._summary_columns = _SummaryColumns()
         os.makedirs(config.sessions_dir, exist_ok=True)
-        os.makedirs(config.exports_dir, exist_ok=True)
 
     @property
     def active_session(self) -> Optional[SessionInfo]:
@@ -58,6 +123,9 @@ class SessionManager:
     def is_recording(self) -> bool:
         return self._active_session is not None
 
+    def on_session_stopped(self, callback: Callable[[SessionInfo], None]):
+        self._on_session_stopped = callback
+
     def start_session(self, activity_type: str = "autre") -> SessionInfo:
         if self._active_session is not None:
             raise RuntimeError("A session is already active")
@@ -65,129 +133,145 @@ class SessionManager:
         if activity_type not in ACTIVITY_TYPES:
             activity_type = "autre"
 
-        session_id = str(uuid.uuid4())[:8]
+        session_id = secrets.token_hex(4)
         start_time = time.time()
 
         self._db.create_session(session_id, start_time, activity_type)
 
-        self._active_session = SessionInfo(
-            id=session_id,
-            start_time=start_time,
-            activity_type=activity_type,
-        )
+        with self._pending_lock:
+            self._pending = []
+            self._summary_columns.reset()
+            self._active_session = SessionInfo(
+                id=session_id,
+                start_time=start_time,
+                activity_type=activity_type,
+            )
         logger.info("Session started: %s [%s]", session_id, activity_type)
         return self._active_session
 
-    def record_data_point(self, data: dict):
-        if self._active_session is None:
+    def record_data_point(self, point: "DataPoint"):
+        with self._pending_lock:
+            if self._active_session is None:
+                return
+            self._pending.append(point)
+            self._summary_columns.append(point)
+            self._active_session.data_point_count += 1
+            if len(self._pending) >= FLUSH_MAX_POINTS:
+                self._flush_locked()
+            elif self._flush_timer is None:
+                # Points of a stalled stream are written after FLUSH_MAX_AGE_SEC
+                self._flush_timer = threading.Timer(FLUSH_MAX_AGE_SEC, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        """Write buffered data points of the active session to the database."""
+        with self._pending_lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._active_session is None or not self._pending:
             return
-        self._db.insert_data_point(self._active_session.id, data)
-        self._active_session.data_point_count += 1
+        batch, self._pending = self._pending, []
+        self._db.insert_data_points(self._active_session.id, batch)
 
     def stop_session(self) -> Optional[dict]:
-        if self._active_session is None:
-            return None
+        # Detach the session under the lock so no point can be buffered
+        # after the final flush.
+        with self._pending_lock:
+            stopped = self._active_session
+            if stopped is None:
+                return None
+            self._flush_locked()
+            self._active_session = None
+            agg = self._summary_columns.aggregates()
 
         end_time = time.time()
-        session_id = self._active_session.id
+        session_id = stopped.id
         self._db.end_session(session_id, end_time)
-        self._active_session.end_time = end_time
-        self._active_session.status = "completed"
+        stopped.end_time = end_time
+        stopped.status = "completed"
 
-        summary = self._compute_summary(session_id)
+        summary = self._compute_summary(session_id, agg)
         self._db.save_summary(session_id, summary)
 
-        session_dict = self._active_session.to_dict()
+        session_dict = stopped.to_dict()
         session_dict["summary"] = summary
 
-        logger.info("Session stopped: %s (%.0fs)", session_id, end_time - self._active_session.start_time)
-        self._active_session = None
+        logger.info("Session stopped: %s (%.0fs)", session_id, end_time - stopped.start_time)
+        if self._on_session_stopped:
+            self._on_session_stopped(stopped)
         return session_dict
 
-    def _compute_summary(self, session_id: str) -> dict:
-        data_points = self._db.get_session_data(session_id)
-        if not data_points:
+    def _compute_summary(self, session_id: str, agg: dict) -> dict:
+        n = agg["n"]
+        if n == 0:
             return {"feedback": "Aucune donnée enregistrée."}
 
         session = self._db.get_session(session_id)
         duration = (session["end_time"] or time.time()) - session["start_time"]
 
-        def avg(key):
-            vals = [dp[key] for dp in data_points if dp.get(key) is not None]
-            return sum(vals) / len(vals) if vals else 0.0
-
-        def max_val(key):
-            vals = [dp[key] for dp in data_points if dp.get(key) is not None]
-            return max(vals) if vals else 0.0
-
-        n = len(data_points)
-        overload_count = sum(
-            1 for dp in data_points
-            if dp.get("cognitive_load") is not None and dp["cognitive_load"] > 70
-        )
-        recovery_count = sum(
-            1 for dp in data_points
-            if dp.get("stress") is not None and dp["stress"] < 30
-            and dp.get("fatigue") is not None and dp["fatigue"] < 30
-        )
-
-        overload_pct = round(overload_count / n * 100, 1) if n > 0 else 0
-        recovery_pct = round(recovery_count / n * 100, 1) if n > 0 else 0
+        overload_pct = round(agg["overload_count"] / n * 100, 1)
+        recovery_pct = round(agg["recovery_count"] / n * 100, 1)
 
         # Generate feedback
         feedback_parts = []
-        avg_load = avg("cognitive_load")
         if overload_pct > 40:
             feedback_parts.append(
                 f"Charge cognitive élevée pendant {overload_pct}% de la session."
             )
-        if avg("fatigue") > 60:
+        if agg["avg_fatigue"] > 60:
             feedback_parts.append("Fatigue mentale importante détectée.")
         if recovery_pct > 30:
             feedback_parts.append("Bons moments de récupération observés.")
-        if avg("stress") > 60:
+        if agg["avg_stress"] > 60:
             feedback_parts.append("Niveau de stress élevé durant la session.")
         if not feedback_parts:
             feedback_parts.append("Session dans les normes. Bon état cognitif général.")
 
         return {
             "duration_sec": round(duration, 1),
-            "avg_hr": round(avg("hr"), 1),
-            "avg_rmssd": round(avg("rmssd"), 2),
-            "avg_stress": round(avg("stress"), 1),
-            "avg_cognitive_load": round(avg("cognitive_load"), 1),
-            "avg_fatigue": round(avg("fatigue"), 1),
-            "max_stress": round(max_val("stress"), 1),
-            "max_cognitive_load": round(max_val("cognitive_load"), 1),
-            "max_fatigue": round(max_val("fatigue"), 1),
+            "avg_hr": round(agg["avg_hr"], 1),
+            "avg_rmssd": round(agg["avg_rmssd"], 2),
+            "avg_stress": round(agg["avg_stress"], 1),
+            "avg_cognitive_load": round(agg["avg_cognitive_load"], 1),
+            "avg_fatigue": round(agg["avg_fatigue"], 1),
+            "max_stress": round(agg["max_stress"], 1),
+            "max_cognitive_load": round(agg["max_cognitive_load"], 1),
+            "max_fatigue": round(agg["max_fatigue"], 1),
             "time_overload_pct": overload_pct,
             "time_recovery_pct": recovery_pct,
             "feedback": " ".join(feedback_parts),
         }
 
-    def export_csv(self, session_id: str) -> str:
-        data_points = self._db.get_session_data(session_id)
-        if not data_points:
-            raise ValueError(f"No data for session {session_id}")
-
-        filename = f"session_{session_id}.csv"
-        filepath = os.path.join(self._config.exports_dir, filename)
+    def iter_csv(self, session_id: str) -> Iterator[str]:
+        """Stream a session's data points as CSV text, header first.
 
-        fieldnames = [
-            "timestamp", "hr", "rmssd", "sdnn", "pnn50", "mean_rr",
-            "lf_power", "hf_power", "lf_hf_ratio",
-            "stress", "cognitive_load", "fatigue",
-            "window_quality", "fatigue_slope", "fatigue_predicted",
-        ]
-
-        with open(filepath, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
-            writer.writeheader()
-            for dp in data_points:
-                writer.writerow({k: dp.get(k) for k in fieldnames})
-
-        logger.info("Exported CSV: %s (%d rows)", filepath, len(data_points))
-        return filepath
+        Raises ValueError immediately (not on first iteration) when the
+        session has no data, so callers can still answer with a 404.
+        """
+        batches = self._db.iter_session_data(session_id)
+        first = next(batches, None)
+        if first is None:
+            raise ValueError(f"No data for session {session_id}")
+        return self._csv_lines(session_id, itertools.chain((first,), batches))
+
+    @staticmethod
+    def _csv_lines(session_id: str, batches: Iterable[list[tuple]]) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(DATA_POINT_COLUMNS)
+        count = 0
+        for batch in batches:
+            writer.writerows(batch)
+            count += len(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        logger.info("Exported CSV for session %s (%d rows)", session_id, count)
 
     def export_summary(self, session_id: str) -> dict:
         session = self._db.get_session(session_id)
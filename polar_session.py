@@ -0,0 +1,132 @@
+"""
+Session BLE partagee par les scripts de test Polar.
+Scan (ou adresse en cache), connexion et negociation MTU au meme endroit;
+chaque script n'ecrit que son test, lance via run().
+"""
+
+import asyncio
+import pickle
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from bleak import BleakClient, BleakScanner
+
+# Address -> name of every Polar already connected to, most recent last
+ADDRESS_CACHE = Path.home() / ".cache" / "polar_addr"
+
+# A cached address that does not answer quickly falls back to a scan
+CACHED_CONNECT_TIMEOUT = 3.0
+
+# Smallest ATT MTU that fits a full PPI frame in one notification
+MIN_MTU = 185
+
+
+class PolarNotFoundError(Exception):
+    pass
+
+
+def is_polar(name: str) -> bool:
+    return "polar" in name.lower()
+
+
+def is_verity_sense(name: str) -> bool:
+    return is_polar(name) and "sense" in name.lower()
+
+
+def load_known_devices() -> dict:
+    try:
+        with open(ADDRESS_CACHE, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+
+
+def save_known_devices(devices: dict):
+    ADDRESS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    with open(ADDRESS_CACHE, "wb") as f:
+        pickle.dump(devices, f)
+
+
+async def _connect_cached(known: dict, name_filter, client_options) -> BleakClient | None:
+    """Connexion directe a l'adresse la plus recente qui passe name_filter."""
+    address = next((a for a, name in reversed(known.items()) if name_filter(name)), None)
+    if address is None:
+        return None
+    client = BleakClient(address, **client_options(address))
+    try:
+        await client.connect(timeout=CACHED_CONNECT_TIMEOUT)
+        return client
+    except Exception as e:
+        print(f"[CACHE] {known[address]} [{address}] injoignable ({e!r}), nouveau scan")
+        try:
+            await client.disconnect()
+        except Exception:
+            pass
+        return None
+
+
+def _no_options(address: str) -> dict:
+    return {}
+
+
+@asynccontextmanager
+async def acquired_polar(name_filter=is_polar, timeout: float = 10.0, client_options=_no_options):
+    """
+    Client connecte au premier Polar dont le nom passe name_filter.
+
+    L'adresse du dernier appareil utilise est essayee directement avec un
+    timeout court; sinon un scan (arrete des le premier appareil
+    correspondant) prend le relais. client_options(address) renvoie les
+    arguments supplementaires de BleakClient.
+    """
+    known = load_known_devices()
+    client = await _connect_cached(known, name_filter, client_options)
+
+    if client is None:
+        print("[SCAN] Recherche du Polar...")
+        device = await BleakScanner.find_device_by_filter(
+            lambda d, adv: bool(d.name) and name_filter(d.name), timeout=timeout
+        )
+        if device is None:
+            raise PolarNotFoundError
+        client = BleakClient(device, **client_options(device.address))
+        await client.connect(timeout=timeout)
+        known[device.address] = device.name
+
+    name = known.pop(client.address)
+    known[client.address] = name
+    save_known_devices(known)
+
+    print(f"[OK] {name} [{client.address}]\n")
+    try:
+        yield client
+    finally:
+        await client.disconnect()
+        print("[DECONNECTE]")
+
+
+async def acquire_mtu(client: BleakClient) -> int:
+    """Negocie un MTU plus grand (BlueZ) pour recevoir plus d'echantillons par notification."""
+    acquire = getattr(client._backend, "_acquire_mtu", None)
+    if acquire is not None:
+        try:
+            await acquire()
+        except Exception as e:
+            print(f"[MTU] Negociation impossible: {e!r}")
+    mtu = client.mtu_size
+    note = "" if mtu >= MIN_MTU else f" (< {MIN_MTU}, notifications fragmentees)"
+    print(f"[MTU] {mtu} octets, {(mtu - 3 - 10) // 6} echantillons PPI max par notification{note}")
+    return mtu
+
+
+def run(*tests, name_filter=is_polar, client_options=_no_options):
+    """Connecte une seule fois puis execute les tests a la suite sur le meme client."""
+    async def main():
+        try:
+            async with acquired_polar(name_filter, client_options=client_options) as client:
+                for test in tests:
+                    await test(client)
+        except PolarNotFoundError:
+            print("[ERREUR] Polar non trouve")
+
+    asyncio.run(main())
@@ -9,6 +9,7 @@ Usage:
 import argparse
 import logging
 import sys
+from dataclasses import replace
 
 from app.config.settings import load_config
 from app.factory import create_app
@@ -35,12 +36,15 @@ def main():
     args = parser.parse_args()
 
     config = load_config()
+    overrides = {}
     if args.host:
-        config.server.host = args.host
+        overrides["host"] = args.host
     if args.port:
-        config.server.port = args.port
+        overrides["port"] = args.port
     if args.debug:
-        config.server.debug = True
+        overrides["debug"] = True
+    if overrides:
+        config = replace(config, server=replace(config.server, **overrides))
 
     setup_logging(config.server.debug)
 
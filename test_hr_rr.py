@@ -8,9 +8,13 @@ import struct
 import sys
 import io
 
+import numpy as np
+
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
-from bleak import BleakClient, BleakScanner
+from bleak import BleakClient
+
+from polar_session import run
 
 HR_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
 
@@ -18,6 +22,8 @@ HR_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
 PMD_CONTROL = "fb005c81-02e7-f387-1cad-8acd2d8df0c8"
 PMD_DATA = "fb005c82-02e7-f387-1cad-8acd2d8df0c8"
 
+_U16 = struct.Struct("<H").unpack_from
+
 
 def parse_hr_measurement(data: bytearray):
     """Parse complet du Heart Rate Measurement selon le standard BLE."""
@@ -32,7 +38,7 @@ def parse_hr_measurement(data: bytearray):
 
     # HR
     if hr_16bit:
-        hr = struct.unpack_from("<H", data, offset)[0]
+        hr = _U16(data, offset)[0]
         offset += 2
     else:
         hr = data[offset]
@@ -42,14 +48,13 @@ def parse_hr_measurement(data: bytearray):
     if energy_present:
         offset += 2
 
-    # RR intervals (1/1024 sec resolution)
+    # RR intervals (1/1024 sec resolution), decoded in one go
     rr_intervals = []
-    if rr_present:
-        while offset + 1 < len(data):
-            rr_raw = struct.unpack_from("<H", data, offset)[0]
-            rr_ms = rr_raw / 1024.0 * 1000.0  # Convert to ms
-            rr_intervals.append(round(rr_ms, 1))
-            offset += 2
+    n_rr = (len(data) - offset) // 2
+    if rr_present and n_rr > 0:
+        rr_raw = np.frombuffer(data, dtype="<u2", count=n_rr, offset=offset)
+        rr_ms = rr_raw / 1024.0 * 1000.0  # Convert to ms
+        rr_intervals = rr_ms.round(1).tolist()
 
     return hr, rr_intervals, contact_detected, contact_supported
 
@@ -83,70 +88,59 @@ def handle_pmd_data(sender, data: bytearray):
     print(f"  [PMD DATA] {len(data)} bytes: {data[:20].hex()}...")
 
 
-async def main():
-    print("[SCAN] Recherche du Polar...")
-    devices = await BleakScanner.discover(timeout=10.0)
-    polar = next((d for d in devices if d.name and "polar" in d.name.lower()), None)
+async def main(client: BleakClient):
+    # === TEST 1 : HR Standard avec RR ===
+    print("=" * 60)
+    print("TEST 1 : Heart Rate Standard (avec RR intervals)")
+    print("=" * 60)
 
-    if not polar:
-        print("[ERREUR] Polar non trouve")
-        return
+    await client.start_notify(HR_UUID, handle_hr)
+    await asyncio.sleep(15)
+    await client.stop_notify(HR_UUID)
 
-    print(f"[OK] {polar.name}\n")
+    print(f"\n>> {sample_count} notifications HR, {rr_count} intervalles RR recus")
 
-    async with BleakClient(polar) as client:
-        # === TEST 1 : HR Standard avec RR ===
-        print("=" * 60)
-        print("TEST 1 : Heart Rate Standard (avec RR intervals)")
-        print("=" * 60)
+    # === TEST 2 : PMD SDK (PPI stream) ===
+    print("\n" + "=" * 60)
+    print("TEST 2 : PMD SDK (Polar Measurement Data)")
+    print("=" * 60)
 
-        await client.start_notify(HR_UUID, handle_hr)
-        await asyncio.sleep(15)
-        await client.stop_notify(HR_UUID)
+    # Lire les capabilities du PMD
+    try:
+        pmd_caps = await client.read_gatt_char(PMD_CONTROL)
+        print(f"[PMD] Capabilities: {pmd_caps.hex()}")
+        print(f"[PMD] Raw bytes: {list(pmd_caps)}")
+    except Exception as e:
+        print(f"[PMD] Erreur lecture capabilities: {e}")
 
-        print(f"\n>> {sample_count} notifications HR, {rr_count} intervalles RR recus")
+    # Ecouter le data channel
+    await client.start_notify(PMD_DATA, handle_pmd_data)
 
-        # === TEST 2 : PMD SDK (PPI stream) ===
-        print("\n" + "=" * 60)
-        print("TEST 2 : PMD SDK (Polar Measurement Data)")
-        print("=" * 60)
+    # Envoyer commande pour demarrer le PPI stream
+    # Format PMD: 0x02 = start, 0x03 = PPI measurement type
+    start_ppi_cmd = bytearray([0x02, 0x03])
+    print(f"[PMD] Envoi commande start PPI: {start_ppi_cmd.hex()}")
 
-        # Lire les capabilities du PMD
-        try:
-            pmd_caps = await client.read_gatt_char(PMD_CONTROL)
-            print(f"[PMD] Capabilities: {pmd_caps.hex()}")
-            print(f"[PMD] Raw bytes: {list(pmd_caps)}")
-        except Exception as e:
-            print(f"[PMD] Erreur lecture capabilities: {e}")
-
-        # Ecouter le data channel
-        await client.start_notify(PMD_DATA, handle_pmd_data)
-
-        # Envoyer commande pour demarrer le PPI stream
-        # Format PMD: 0x02 = start, 0x03 = PPI measurement type
-        start_ppi_cmd = bytearray([0x02, 0x03])
-        print(f"[PMD] Envoi commande start PPI: {start_ppi_cmd.hex()}")
+    try:
+        await client.write_gatt_char(PMD_CONTROL, start_ppi_cmd, response=True)
+        print("[PMD] Commande envoyee, attente 15 secondes...")
+        await asyncio.sleep(15)
+    except Exception as e:
+        print(f"[PMD] Erreur: {e}")
 
+        # Essayer aussi avec indicate au lieu de notify
+        print("[PMD] Tentative avec indicate sur le control point...")
         try:
+            await client.start_notify(PMD_CONTROL, lambda s, d: print(f"  [PMD CTRL] {d.hex()}"))
             await client.write_gatt_char(PMD_CONTROL, start_ppi_cmd, response=True)
-            print("[PMD] Commande envoyee, attente 15 secondes...")
             await asyncio.sleep(15)
-        except Exception as e:
-            print(f"[PMD] Erreur: {e}")
-
-            # Essayer aussi avec indicate au lieu de notify
-            print("[PMD] Tentative avec indicate sur le control point...")
-            try:
-                await client.start_notify(PMD_CONTROL, lambda s, d: print(f"  [PMD CTRL] {d.hex()}"))
-                await client.write_gatt_char(PMD_CONTROL, start_ppi_cmd, response=True)
-                await asyncio.sleep(15)
-            except Exception as e2:
-                print(f"[PMD] Erreur indicate: {e2}")
+        except Exception as e2:
+            print(f"[PMD] Erreur indicate: {e2}")
 
-        await client.stop_notify(PMD_DATA)
+    await client.stop_notify(PMD_DATA)
 
-        print("\n[TERMINE]")
+    print("\n[TERMINE]")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main)
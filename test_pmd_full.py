@@ -13,9 +13,13 @@ import struct
 import sys
 import io
 
+import numpy as np
+
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
-from bleak import BleakClient, BleakScanner
+from bleak import BleakClient
+
+from polar_session import acquire_mtu, is_verity_sense, run
 
 PMD_CONTROL = "fb005c81-02e7-f387-1cad-8acd2d8df0c8"
 PMD_DATA    = "fb005c82-02e7-f387-1cad-8acd2d8df0c8"
@@ -32,7 +36,67 @@ CMD_GET_SETTINGS = 0x01
 CMD_START = 0x02
 CMD_STOP = 0x03
 
-ppi_samples = []
+# Display names indexed by code (None = no name)
+TYPE_NAMES = ("ECG", "PPG", "ACC", "PPI", None, "GYRO")
+CMD_NAMES = (None, "GET_SETTINGS", "START", "STOP")
+STATUS_NAMES = ("OK", "INVALID_OP", "INVALID_TYPE", "NOT_ALLOWED", "INVALID_PARAM",
+                "ALREADY_IN_USE", "INVALID_RESOLUTION", "INVALID_SAMPLE_RATE",
+                "INVALID_RANGE", "INVALID_MTU", "INVALID_CHANNELS", "ERROR")
+PARAM_NAMES = ("SAMPLE_RATE", "RESOLUTION", "RANGE", "RANGE_MILLIUNIT", "CHANNELS", "FACTOR")
+
+
+def _name(names: tuple, code: int, unknown: str) -> str:
+    """Nom du code, ou "<unknown>(code)" s'il n'est pas dans la table."""
+    name = names[code] if 0 <= code < len(names) else None
+    return name or f"{unknown}({code})"
+
+
+PMD_START_PPI = bytes((CMD_START, TYPE_PPI))
+PMD_STOP_PPI = bytes((CMD_STOP, TYPE_PPI))
+
+_U16 = struct.Struct("<H").unpack_from
+
+# PPI sample: HR(1), PP(2), errEst(2), flags(1)
+PPI_DTYPE = np.dtype([("hr", "u1"), ("ppi", "<u2"), ("err", "<u2"), ("flags", "u1")])
+
+# Verity Sense PPI frames: type(1) + timestamp(8) + frame type(1), then samples
+PPI_FRAME_OFFSET = 10
+_misaligned_reported = False
+
+
+class SampleBuffer:
+    """Tableau numpy pre-alloue; la capacite double quand il est plein."""
+
+    def __init__(self, dtype, capacity: int = 1 << 16):
+        self._buf = np.empty(capacity, dtype=dtype)
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _reserve(self, size: int):
+        if size > len(self._buf):
+            grown = np.empty(max(size, 2 * len(self._buf)), dtype=self._buf.dtype)
+            grown[:self._n] = self._buf[:self._n]
+            self._buf = grown
+
+    def append(self, value):
+        self._reserve(self._n + 1)
+        self._buf[self._n] = value
+        self._n += 1
+
+    def extend(self, values: np.ndarray):
+        end = self._n + len(values)
+        self._reserve(end)
+        self._buf[self._n:end] = values
+        self._n = end
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._buf[:self._n]
+
+
+ppi_samples = SampleBuffer(np.uint16)
 
 
 def parse_pmd_control_response(data: bytearray):
@@ -66,14 +130,9 @@ def parse_pmd_control_response(data: bytearray):
         meas_type = data[2]
         status = data[3] if len(data) > 3 else -1
 
-        status_str = {0: "OK", 1: "INVALID_OP", 2: "INVALID_TYPE",
-                      3: "NOT_ALLOWED", 4: "INVALID_PARAM", 5: "ALREADY_IN_USE",
-                      6: "INVALID_RESOLUTION", 7: "INVALID_SAMPLE_RATE",
-                      8: "INVALID_RANGE", 9: "INVALID_MTU",
-                      10: "INVALID_CHANNELS", 11: "ERROR"}.get(status, f"UNKNOWN({status})")
-
-        cmd_str = {1: "GET_SETTINGS", 2: "START", 3: "STOP"}.get(cmd_code, f"CMD({cmd_code})")
-        type_str = {0: "ECG", 1: "PPG", 2: "ACC", 3: "PPI", 5: "GYRO"}.get(meas_type, f"TYPE({meas_type})")
+        status_str = _name(STATUS_NAMES, status, "UNKNOWN")
+        cmd_str = _name(CMD_NAMES, cmd_code, "CMD")
+        type_str = _name(TYPE_NAMES, meas_type, "TYPE")
 
         print(f"  [CTRL] Response: {cmd_str} {type_str} -> {status_str}")
 
@@ -94,9 +153,7 @@ def parse_settings(data: bytearray, meas_type: int):
         param_type = data[idx]
         idx += 1
 
-        param_names = {0: "SAMPLE_RATE", 1: "RESOLUTION", 2: "RANGE", 3: "RANGE_MILLIUNIT",
-                       4: "CHANNELS", 5: "FACTOR"}
-        param_name = param_names.get(param_type, f"PARAM({param_type})")
+        param_name = _name(PARAM_NAMES, param_type, "PARAM")
 
         # Count of values
         if idx >= len(data):
@@ -108,7 +165,7 @@ def parse_settings(data: bytearray, meas_type: int):
         for _ in range(count):
             if idx + 1 >= len(data):
                 break
-            val = struct.unpack_from("<H", data, idx)[0]
+            val = _U16(data, idx)[0]
             values.append(val)
             idx += 2
 
@@ -117,39 +174,34 @@ def parse_settings(data: bytearray, meas_type: int):
 
 def handle_pmd_data(sender, data: bytearray):
     """Parse les donnees PMD."""
+    global _misaligned_reported
     if len(data) < 2:
         return
 
     meas_type = data[0]
-    type_str = {0: "ECG", 1: "PPG", 2: "ACC", 3: "PPI", 5: "GYRO"}.get(meas_type, f"TYPE({meas_type})")
+    type_str = _name(TYPE_NAMES, meas_type, "TYPE")
 
     if meas_type == TYPE_PPI:
         # PPI data format:
         # byte 0: measurement type (0x03)
-        # byte 1: timestamp info / frame type
+        # bytes 1-8: timestamp, byte 9: frame type
         # Then PPI samples: each has HR(1), PP(2), errEst(2), flags(1) = 6 bytes
-        # OR newer format with different structure
 
         print(f"  [PPI DATA] {len(data)} bytes: {data.hex()}")
 
-        # Try to parse PPI samples starting from different offsets
-        for start_offset in [1, 2, 3, 8, 9, 10]:
-            remaining = data[start_offset:]
-            if len(remaining) >= 6 and len(remaining) % 6 == 0:
-                n_samples = len(remaining) // 6
-                print(f"  [PPI] Trying offset {start_offset} ({n_samples} samples):")
-                for i in range(n_samples):
-                    chunk = remaining[i*6:(i+1)*6]
-                    hr = chunk[0]
-                    pp = struct.unpack_from("<H", chunk, 1)[0]
-                    err = struct.unpack_from("<H", chunk, 3)[0]
-                    flags = chunk[5]
-                    print(f"  [PPI]   HR={hr}, PPI={pp}ms, err={err}ms, flags=0x{flags:02x}")
-                    ppi_samples.append(pp)
-                break
-        else:
-            # Just dump the raw data for analysis
-            print(f"  [PPI] Cannot find 6-byte alignment. Raw: {list(data)}")
+        n_bytes = len(data) - PPI_FRAME_OFFSET
+        if n_bytes < 6 or n_bytes % 6:
+            # Dump the first malformed frame only
+            if not _misaligned_reported:
+                _misaligned_reported = True
+                print(f"  [PPI] Frame not 6-byte aligned after offset {PPI_FRAME_OFFSET}. Raw: {list(data)}")
+            return
+
+        samples = np.frombuffer(data, dtype=PPI_DTYPE, offset=PPI_FRAME_OFFSET)
+        print(f"  [PPI] {len(samples)} samples:")
+        for hr, pp, err, flags in samples.tolist():
+            print(f"  [PPI]   HR={hr}, PPI={pp}ms, err={err}ms, flags=0x{flags:02x}")
+        ppi_samples.extend(samples["ppi"])
     else:
         print(f"  [{type_str} DATA] {len(data)} bytes: {data[:30].hex()}...")
 
@@ -159,108 +211,88 @@ def handle_pmd_control(sender, data: bytearray):
     parse_pmd_control_response(data)
 
 
-async def main():
-    print("[SCAN] Recherche du Polar...")
-    devices = await BleakScanner.discover(timeout=10.0)
-
-    # Trouver les deux Polar
-    polars = [d for d in devices if d.name and "polar" in d.name.lower()]
-    for p in polars:
-        print(f"  Found: {p.name} [{p.address}]")
-
-    polar = next((d for d in polars if "sense" in d.name.lower()), polars[0] if polars else None)
-
-    if not polar:
-        print("[ERREUR] Polar non trouve")
-        return
-
-    print(f"\n[CONNECT] {polar.name}...")
-
-    async with BleakClient(polar) as client:
-        print("[OK] Connecte\n")
-
-        # === Subscribe to control point (indications) ===
-        print("=" * 60)
-        print("ETAPE 1 : Subscribe au control point + data channel")
-        print("=" * 60)
+async def main(client: BleakClient):
+    await acquire_mtu(client)
+    print()
 
-        await client.start_notify(PMD_CONTROL, handle_pmd_control)
-        print("[OK] Subscribed to PMD Control (indications)")
+    # === Subscribe to control point (indications) ===
+    print("=" * 60)
+    print("ETAPE 1 : Subscribe au control point + data channel")
+    print("=" * 60)
 
-        await client.start_notify(PMD_DATA, handle_pmd_data)
-        print("[OK] Subscribed to PMD Data (notifications)")
+    await client.start_notify(PMD_CONTROL, handle_pmd_control)
+    print("[OK] Subscribed to PMD Control (indications)")
 
-        await asyncio.sleep(1)
+    await client.start_notify(PMD_DATA, handle_pmd_data)
+    print("[OK] Subscribed to PMD Data (notifications)")
 
-        # === Get PPI measurement settings ===
-        print("\n" + "=" * 60)
-        print("ETAPE 2 : GET settings pour PPI (type 0x03)")
-        print("=" * 60)
+    await asyncio.sleep(1)
 
-        get_ppi_settings = bytearray([CMD_GET_SETTINGS, TYPE_PPI])
-        print(f"[CMD] Envoi: {get_ppi_settings.hex()}")
-        await client.write_gatt_char(PMD_CONTROL, get_ppi_settings, response=True)
-        await asyncio.sleep(2)
+    # === Get PPI measurement settings ===
+    print("\n" + "=" * 60)
+    print("ETAPE 2 : GET settings pour PPI (type 0x03)")
+    print("=" * 60)
 
-        # === Get PPG measurement settings ===
-        print("\n" + "=" * 60)
-        print("ETAPE 3 : GET settings pour PPG (type 0x01)")
-        print("=" * 60)
+    get_ppi_settings = bytearray([CMD_GET_SETTINGS, TYPE_PPI])
+    print(f"[CMD] Envoi: {get_ppi_settings.hex()}")
+    await client.write_gatt_char(PMD_CONTROL, get_ppi_settings, response=True)
+    await asyncio.sleep(2)
 
-        get_ppg_settings = bytearray([CMD_GET_SETTINGS, TYPE_PPG])
-        print(f"[CMD] Envoi: {get_ppg_settings.hex()}")
-        await client.write_gatt_char(PMD_CONTROL, get_ppg_settings, response=True)
-        await asyncio.sleep(2)
+    # === Get PPG measurement settings ===
+    print("\n" + "=" * 60)
+    print("ETAPE 3 : GET settings pour PPG (type 0x01)")
+    print("=" * 60)
 
-        # === Start PPI stream ===
-        print("\n" + "=" * 60)
-        print("ETAPE 4 : START PPI stream")
-        print("=" * 60)
+    get_ppg_settings = bytearray([CMD_GET_SETTINGS, TYPE_PPG])
+    print(f"[CMD] Envoi: {get_ppg_settings.hex()}")
+    await client.write_gatt_char(PMD_CONTROL, get_ppg_settings, response=True)
+    await asyncio.sleep(2)
 
-        # Simple start command
-        start_ppi = bytearray([CMD_START, TYPE_PPI])
-        print(f"[CMD] Envoi simple: {start_ppi.hex()}")
-        await client.write_gatt_char(PMD_CONTROL, start_ppi, response=True)
-        await asyncio.sleep(2)
+    # === Start PPI stream ===
+    print("\n" + "=" * 60)
+    print("ETAPE 4 : START PPI stream")
+    print("=" * 60)
 
-        # If that didn't work, try with empty parameters
-        # Format: CMD_START, TYPE, then setting parameters
-        # PPI typically needs no parameters (or minimal ones)
+    # Simple start command
+    print(f"[CMD] Envoi simple: {PMD_START_PPI.hex()}")
+    await client.write_gatt_char(PMD_CONTROL, PMD_START_PPI, response=True)
+    await asyncio.sleep(2)
 
-        # Try with sample rate parameter: type=0x00, value
-        start_ppi_v2 = bytearray([CMD_START, TYPE_PPI, 0x00, 0x01, 0x00, 0x01, 0x01, 0x00, 0x01, 0x00])
-        print(f"[CMD] Envoi avec params v2: {start_ppi_v2.hex()}")
-        try:
-            await client.write_gatt_char(PMD_CONTROL, start_ppi_v2, response=True)
-        except Exception as e:
-            print(f"[CMD] Erreur v2: {e}")
-        await asyncio.sleep(2)
+    # If that didn't work, try with empty parameters
+    # Format: CMD_START, TYPE, then setting parameters
+    # PPI typically needs no parameters (or minimal ones)
 
-        # === Wait and collect data ===
-        print("\n" + "=" * 60)
-        print("ETAPE 5 : Attente de donnees PPI (20 secondes)...")
-        print("=" * 60)
+    # Try with sample rate parameter: type=0x00, value
+    start_ppi_v2 = bytearray([CMD_START, TYPE_PPI, 0x00, 0x01, 0x00, 0x01, 0x01, 0x00, 0x01, 0x00])
+    print(f"[CMD] Envoi avec params v2: {start_ppi_v2.hex()}")
+    try:
+        await client.write_gatt_char(PMD_CONTROL, start_ppi_v2, response=True)
+    except Exception as e:
+        print(f"[CMD] Erreur v2: {e}")
+    await asyncio.sleep(2)
 
-        await asyncio.sleep(20)
+    # === Wait and collect data ===
+    print("\n" + "=" * 60)
+    print("ETAPE 5 : Attente de donnees PPI (20 secondes)...")
+    print("=" * 60)
 
-        # === Stop ===
-        stop_ppi = bytearray([CMD_STOP, TYPE_PPI])
-        try:
-            await client.write_gatt_char(PMD_CONTROL, stop_ppi, response=True)
-        except:
-            pass
+    await asyncio.sleep(20)
 
-        await asyncio.sleep(1)
+    # === Stop ===
+    try:
+        await client.write_gatt_char(PMD_CONTROL, PMD_STOP_PPI, response=True)
+    except:
+        pass
 
-        await client.stop_notify(PMD_DATA)
-        await client.stop_notify(PMD_CONTROL)
+    await asyncio.sleep(1)
 
-        print(f"\n[RESULTAT] {len(ppi_samples)} samples PPI collectes")
-        if ppi_samples:
-            print(f"[RESULTAT] PPI values: {ppi_samples[:20]}")
+    await client.stop_notify(PMD_DATA)
+    await client.stop_notify(PMD_CONTROL)
 
-    print("[DECONNECTE]")
+    print(f"\n[RESULTAT] {len(ppi_samples)} samples PPI collectes")
+    if ppi_samples:
+        print(f"[RESULTAT] PPI values: {ppi_samples.values[:20].tolist()}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main, name_filter=is_verity_sense)
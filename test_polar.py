@@ -13,10 +13,13 @@ HR_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
 PPI_UUID = "fb005c81-02e7-f387-1cad-8acd2d8df0c8"
 BATTERY_UUID = "00002a19-0000-1000-8000-00805f9b34fb"
 
+# Pre-compiled little-endian decoders for the notification handlers
+_U16 = struct.Struct("<H").unpack_from
+
 
 def handle_hr(sender, data: bytearray):
     flags = data[0]
-    hr = struct.unpack_from("<H" if flags & 0x01 else "<B", data, 1)[0]
+    hr = _U16(data, 1)[0] if flags & 0x01 else data[1]
     print(f"  ❤️  HR = {hr} bpm")
 
 
@@ -24,7 +27,7 @@ def handle_ppi(sender, data: bytearray):
     index = 0
     ppis = []
     while index + 6 <= len(data):
-        ppi = struct.unpack_from("<H", data, index + 1)[0]
+        ppi = _U16(data, index + 1)[0]
         flags = data[index + 5]
         contact = "✅" if flags & 0x01 else "❌"
         ppis.append(f"{ppi}ms({contact})")
@@ -81,13 +84,17 @@ async def main():
         print("📡 Streaming HR + PPI pendant 30 secondes...")
         print("=" * 50 + "\n")
 
-        await client.start_notify(HR_UUID, handle_hr)
-        await client.start_notify(PPI_UUID, handle_ppi)
+        await asyncio.gather(
+            client.start_notify(HR_UUID, handle_hr),
+            client.start_notify(PPI_UUID, handle_ppi),
+        )
 
         await asyncio.sleep(30)
 
-        await client.stop_notify(HR_UUID)
-        await client.stop_notify(PPI_UUID)
+        await asyncio.gather(
+            client.stop_notify(HR_UUID),
+            client.stop_notify(PPI_UUID),
+        )
 
         print("\n✅ Streaming terminé. Déconnexion.")
 
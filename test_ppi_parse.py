@@ -7,24 +7,135 @@ import asyncio
 import struct
 import sys
 import io
+from collections import Counter
+
+import numpy as np
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
-from bleak import BleakClient, BleakScanner
+from bleak import BleakClient
+
+from polar_session import acquire_mtu, is_verity_sense, run
 
 PMD_CONTROL = "fb005c81-02e7-f387-1cad-8acd2d8df0c8"
 PMD_DATA    = "fb005c82-02e7-f387-1cad-8acd2d8df0c8"
 
-all_ppi = []
-all_hr = []
+# PMD commands: [op_code (0x02 start, 0x03 stop), measurement_type (0x03 PPI)]
+PMD_START_PPI = bytes((0x02, 0x03))
+PMD_STOP_PPI = bytes((0x03, 0x03))
 
 HR_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
 
+# Pre-compiled little-endian decoders for the notification handlers
+_U16 = struct.Struct("<H").unpack_from
+_U64 = struct.Struct("<Q").unpack_from
+
+# Candidate sample layouts, decoded with one np.frombuffer per packet
+PPI_DTYPE_A = np.dtype([("hr", "u1"), ("ppi", "<u2"), ("err", "<u2"), ("flags", "u1")])
+PPI_DTYPE_B = np.dtype([("ppi", "<u2"), ("err", "<u2"), ("hr", "u1"), ("flags", "u1")])
+PPI_DTYPE_C = np.dtype([("flags", "u1"), ("ppi", "<u2"), ("err", "<u2"), ("hr", "u1")])
+PPI_DTYPE_D = np.dtype([("ppi", "<u2"), ("err", "<u2"), ("flags", "u1")])
+
+
+class RunningStats:
+    """Moyenne, ecart-type (ddof=0), min et max en streaming, sans garder les echantillons."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.lo = None
+        self.hi = None
+
+    def __len__(self) -> int:
+        return self.n
+
+    def add(self, value):
+        """Mise a jour de Welford pour un echantillon."""
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        self.lo = value if self.lo is None else min(self.lo, value)
+        self.hi = value if self.hi is None else max(self.hi, value)
+
+    def update(self, values: np.ndarray):
+        """Fusionne un paquet d'echantillons (formule de Chan)."""
+        k = len(values)
+        if not k:
+            return
+        batch_mean = values.mean()
+        batch_m2 = np.square(values - batch_mean).sum()
+        n = self.n + k
+        delta = batch_mean - self.mean
+        self.m2 += batch_m2 + delta * delta * self.n * k / n
+        self.mean += delta * k / n
+        self.n = n
+        lo, hi = int(values.min()), int(values.max())
+        self.lo = lo if self.lo is None else min(self.lo, lo)
+        self.hi = hi if self.hi is None else max(self.hi, hi)
+
+    @property
+    def std(self) -> float:
+        return (self.m2 / self.n) ** 0.5
+
+
+all_ppi = RunningStats()
+all_hr = RunningStats()
+
+# The first packets are decoded with every 6-byte layout; the layout that
+# wins most of them is then the only one decoded
+FORMAT_VOTE_PACKETS = 10
+_format_votes = Counter()
+_format_rejects = Counter()
+_chosen = None
+
+# (PPI offset, HR offset) of the first sample in each 6-byte layout
+_FIRST_SAMPLE = {"A": (1, 0), "B": (0, 4), "C": (1, 5)}
+
+
+def _plausible_formats(raw) -> str:
+    """Formats dont le premier echantillon a un PPI et un HR realistes."""
+    if len(raw) < 6 or len(raw) % 6:
+        return ""
+    formats = ""
+    for name, (ppi_off, hr_off) in _FIRST_SAMPLE.items():
+        if 250 < _U16(raw, ppi_off)[0] < 2000 and 20 < raw[hr_off] < 220:
+            formats += name
+        else:
+            _format_rejects[name] += 1
+    return formats
+
+
+def _format_score(arr: np.ndarray) -> float:
+    """Part des PPI plausibles + coherence du bit contact_supported."""
+    ppi = arr["ppi"]
+    supported = arr["flags"] & 0x02
+    plausible = np.count_nonzero((ppi > 250) & (ppi < 2000))
+    consistent = np.count_nonzero(supported == supported[0])
+    return (plausible + consistent) / len(arr)
+
+
+def _vote_format(decoded: dict) -> str | None:
+    """Vote pour le meilleur format du paquet; renvoie le format retenu une fois decide."""
+    global _chosen
+    scores = {name: _format_score(arr) for name, arr in decoded.items() if len(arr)}
+    if not scores:
+        return None
+    _format_votes[max(scores, key=scores.get)] += 1
+    if _format_votes.total() >= FORMAT_VOTE_PACKETS:
+        _chosen = _format_votes.most_common(1)[0][0]
+    return _chosen
+
+
+# Notifications waiting to be parsed; callbacks only enqueue raw bytes
+NOTIFY_QUEUE_SIZE = 256
+
 
 def handle_hr(sender, data: bytearray):
     flags = data[0]
-    hr = struct.unpack_from("<H" if flags & 0x01 else "<B", data, 1)[0]
-    all_hr.append(hr)
+    hr = _U16(data, 1)[0] if flags & 0x01 else data[1]
+    all_hr.add(hr)
 
 
 def handle_pmd_data(sender, data: bytearray):
@@ -53,69 +164,63 @@ def handle_pmd_data(sender, data: bytearray):
     if meas_type != 0x03:
         return
 
-    timestamp = struct.unpack_from("<Q", data, 1)[0]
+    timestamp = _U64(data, 1)[0]
     frame_type = data[9]
 
-    raw = data[10:]
+    raw = memoryview(data)[10:]
     n_bytes = len(raw)
+    out = []
+    decoded = {}
+    formats = _chosen or _plausible_formats(raw)
 
-    print(f"\n  --- Packet: {n_bytes} data bytes, timestamp={timestamp}, frame={frame_type} ---")
-    print(f"  Raw hex: {raw.hex()}")
-    print(f"  Raw bytes: {list(raw)}")
+    out.append(f"\n  --- Packet: {n_bytes} data bytes, timestamp={timestamp}, frame={frame_type} ---")
+    out.append(f"  Raw hex: {raw.hex()}")
+    out.append(f"  Raw bytes: {list(raw)}")
 
     # === FORMAT A: Polar SDK officiel ===
     # HR(1) + PPI(2) + errEst(2) + flags(1) = 6 bytes
-    if n_bytes % 6 == 0:
-        n = n_bytes // 6
-        print(f"\n  FORMAT A (HR,PPI,err,flags) - {n} samples:")
-        for i in range(n):
-            o = i * 6
-            hr = raw[o]
-            ppi = struct.unpack_from("<H", raw, o + 1)[0]
-            err = struct.unpack_from("<H", raw, o + 3)[0]
-            flags = raw[o + 5]
+    if n_bytes % 6 == 0 and "A" in formats:
+        arr = decoded["A"] = np.frombuffer(raw, dtype=PPI_DTYPE_A)
+        out.append(f"\n  FORMAT A (HR,PPI,err,flags) - {len(arr)} samples:")
+        for i, (hr, ppi, err, flags) in enumerate(arr.tolist()):
             skin = "Y" if flags & 0x01 else "N"
             supp = "Y" if flags & 0x02 else "N"
-            print(f"    [{i}] HR={hr:3d} PPI={ppi:4d}ms err={err:3d}ms skin={skin} supp={supp} flags=0b{flags:08b}")
-            if 250 < ppi < 2000:
-                all_ppi.append(ppi)
+            out.append(f"    [{i}] HR={hr:3d} PPI={ppi:4d}ms err={err:3d}ms skin={skin} supp={supp} flags=0b{flags:08b}")
 
     # === FORMAT B: PPI(2) + errEst(2) + HR(1) + flags(1) = 6 bytes ===
-    if n_bytes % 6 == 0:
-        n = n_bytes // 6
-        print(f"\n  FORMAT B (PPI,err,HR,flags) - {n} samples:")
-        for i in range(n):
-            o = i * 6
-            ppi = struct.unpack_from("<H", raw, o)[0]
-            err = struct.unpack_from("<H", raw, o + 2)[0]
-            hr = raw[o + 4]
-            flags = raw[o + 5]
+    if n_bytes % 6 == 0 and "B" in formats:
+        arr = decoded["B"] = np.frombuffer(raw, dtype=PPI_DTYPE_B)
+        out.append(f"\n  FORMAT B (PPI,err,HR,flags) - {len(arr)} samples:")
+        for i, (ppi, err, hr, flags) in enumerate(arr.tolist()):
             skin = "Y" if flags & 0x01 else "N"
-            print(f"    [{i}] PPI={ppi:4d}ms err={err:3d}ms HR={hr:3d} skin={skin} flags=0b{flags:08b}")
+            out.append(f"    [{i}] PPI={ppi:4d}ms err={err:3d}ms HR={hr:3d} skin={skin} flags=0b{flags:08b}")
 
     # === FORMAT C: flags(1) + PPI(2) + errEst(2) + HR(1) = 6 bytes ===
-    if n_bytes % 6 == 0:
-        n = n_bytes // 6
-        print(f"\n  FORMAT C (flags,PPI,err,HR) - {n} samples:")
-        for i in range(n):
-            o = i * 6
-            flags = raw[o]
-            ppi = struct.unpack_from("<H", raw, o + 1)[0]
-            err = struct.unpack_from("<H", raw, o + 3)[0]
-            hr = raw[o + 5]
+    if n_bytes % 6 == 0 and "C" in formats:
+        arr = decoded["C"] = np.frombuffer(raw, dtype=PPI_DTYPE_C)
+        out.append(f"\n  FORMAT C (flags,PPI,err,HR) - {len(arr)} samples:")
+        for i, (flags, ppi, err, hr) in enumerate(arr.tolist()):
             skin = "Y" if flags & 0x01 else "N"
-            print(f"    [{i}] PPI={ppi:4d}ms err={err:3d}ms HR={hr:3d} skin={skin} flags=0b{flags:08b}")
+            out.append(f"    [{i}] PPI={ppi:4d}ms err={err:3d}ms HR={hr:3d} skin={skin} flags=0b{flags:08b}")
+
+    if _chosen is None and decoded and _vote_format(decoded):
+        out.append(f"\n  [FORMAT] {_chosen} retenu apres {FORMAT_VOTE_PACKETS} paquets: {dict(_format_votes)}")
+    collected = decoded.get(_chosen or "A")
+    if collected is None and _chosen is None and n_bytes % 6 == 0:
+        # Until the vote ends, PPIs come from A even when the prefilter skipped it
+        collected = np.frombuffer(raw, dtype=PPI_DTYPE_A)
+    if collected is not None:
+        ppi = collected["ppi"]
+        all_ppi.update(ppi[(ppi > 250) & (ppi < 2000)])
 
     # === Try 5-byte samples too ===
     if n_bytes % 5 == 0:
-        n = n_bytes // 5
-        print(f"\n  FORMAT D (5-byte: PPI(2),err(2),flags(1)) - {n} samples:")
-        for i in range(n):
-            o = i * 5
-            ppi = struct.unpack_from("<H", raw, o)[0]
-            err = struct.unpack_from("<H", raw, o + 2)[0]
-            flags = raw[o + 4]
-            print(f"    [{i}] PPI={ppi:4d}ms err={err:3d}ms flags=0b{flags:08b}")
+        arr = np.frombuffer(raw, dtype=PPI_DTYPE_D)
+        out.append(f"\n  FORMAT D (5-byte: PPI(2),err(2),flags(1)) - {len(arr)} samples:")
+        for i, (ppi, err, flags) in enumerate(arr.tolist()):
+            out.append(f"    [{i}] PPI={ppi:4d}ms err={err:3d}ms flags=0b{flags:08b}")
+
+    sys.stdout.write("\n".join(out) + "\n")
 
 
 def handle_pmd_control(sender, data: bytearray):
@@ -127,54 +232,81 @@ def handle_pmd_control(sender, data: bytearray):
         print(f"  [CTRL] {data.hex()}")
 
 
-async def main():
-    print("[SCAN]...")
-    devices = await BleakScanner.discover(timeout=10.0)
-    polar = next((d for d in devices if d.name and "polar" in d.name.lower() and "sense" in d.name.lower()), None)
+def _enqueue(queue: asyncio.Queue, item):
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        print("  [QUEUE] pleine, notification ignoree")
 
-    if not polar:
-        print("Polar Sense non trouve")
-        return
 
-    print(f"[OK] {polar.name}\n")
-
-    async with BleakClient(polar) as client:
-        # Subscribe
-        await client.start_notify(PMD_CONTROL, handle_pmd_control)
-        await client.start_notify(PMD_DATA, handle_pmd_data)
-        await client.start_notify(HR_UUID, handle_hr)
-        await asyncio.sleep(1)
-
-        # Start PPI
-        print("[START PPI]")
-        await client.write_gatt_char(PMD_CONTROL, bytearray([0x02, 0x03]), response=True)
-        await asyncio.sleep(1)
-
-        # Collect 30 seconds
-        print("[COLLECTING 30 seconds...]")
-        await asyncio.sleep(30)
-
-        # Stop
-        await client.write_gatt_char(PMD_CONTROL, bytearray([0x03, 0x03]), response=True)
-        await asyncio.sleep(1)
-
-        await client.stop_notify(PMD_DATA)
-        await client.stop_notify(PMD_CONTROL)
-        await client.stop_notify(HR_UUID)
-
-        print(f"\n{'='*60}")
-        print(f"RESUME: {len(all_ppi)} PPI valides collectes")
-        if all_ppi:
-            import numpy as np
-            arr = np.array(all_ppi)
-            print(f"  PPI mean={arr.mean():.0f}ms, std={arr.std():.0f}ms")
-            print(f"  PPI min={arr.min()}ms, max={arr.max()}ms")
-            print(f"  HR estim = {60000/arr.mean():.0f} bpm")
-        if all_hr:
-            print(f"  HR direct mean = {sum(all_hr)/len(all_hr):.0f} bpm")
+def _deferred(queue: asyncio.Queue, handler):
+    """Callback bleak qui copie le paquet et laisse le parsing au consommateur."""
+    loop = asyncio.get_running_loop()
+
+    def on_notify(sender, data: bytearray):
+        loop.call_soon_threadsafe(_enqueue, queue, (handler, sender, bytes(data)))
+
+    return on_notify
+
+
+async def _consume(queue: asyncio.Queue):
+    while True:
+        handler, sender, data = await queue.get()
+        try:
+            handler(sender, data)
+        except Exception as e:
+            print(f"  [ERR] {handler.__name__}: {e!r}")
+        finally:
+            queue.task_done()
+
+
+async def main(client: BleakClient):
+    queue = asyncio.Queue(maxsize=NOTIFY_QUEUE_SIZE)
+    consumer = asyncio.create_task(_consume(queue))
+
+    await acquire_mtu(client)
+
+    # Subscribe
+    await asyncio.gather(
+        client.start_notify(PMD_CONTROL, _deferred(queue, handle_pmd_control)),
+        client.start_notify(PMD_DATA, _deferred(queue, handle_pmd_data)),
+        client.start_notify(HR_UUID, _deferred(queue, handle_hr)),
+    )
+    await asyncio.sleep(1)
+
+    # Start PPI
+    print("[START PPI]")
+    await client.write_gatt_char(PMD_CONTROL, PMD_START_PPI, response=True)
+    await asyncio.sleep(1)
+
+    # Collect 30 seconds
+    print("[COLLECTING 30 seconds...]")
+    await asyncio.sleep(30)
+
+    # Stop
+    await client.write_gatt_char(PMD_CONTROL, PMD_STOP_PPI, response=True)
+    await asyncio.sleep(1)
+
+    await asyncio.gather(
+        client.stop_notify(PMD_DATA),
+        client.stop_notify(PMD_CONTROL),
+        client.stop_notify(HR_UUID),
+    )
+    await queue.join()
+    consumer.cancel()
+
+    print(f"\n{'='*60}")
+    print(f"RESUME: {len(all_ppi)} PPI valides collectes")
+    if all_ppi:
+        print(f"  PPI mean={all_ppi.mean:.0f}ms, std={all_ppi.std:.0f}ms")
+        print(f"  PPI min={all_ppi.lo}ms, max={all_ppi.hi}ms")
+        print(f"  HR estim = {60000/all_ppi.mean:.0f} bpm")
+    if all_hr:
+        print(f"  HR direct mean = {all_hr.mean:.0f} bpm")
+    print(f"  Formats: votes={dict(_format_votes)}, rejets={dict(_format_rejects)}")
 
     print("[DONE]")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main, name_filter=is_verity_sense)
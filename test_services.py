@@ -3,51 +3,118 @@ Test : decouvrir tous les services et caracteristiques GATT du Polar.
 On va trouver le bon UUID pour le PPI/RR.
 """
 
-import asyncio
+import pickle
 import sys
 import io
+from pathlib import Path
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
 
-from bleak import BleakClient, BleakScanner
+from bleak import BleakClient
 
+from polar_session import run
 
-async def main():
-    print("[SCAN] Recherche du Polar...")
-    devices = await BleakScanner.discover(timeout=10.0)
-    polar = next((d for d in devices if d.name and "polar" in d.name.lower()), None)
+FIRMWARE_REVISION = "00002a26-0000-1000-8000-00805f9b34fb"
 
-    if not polar:
-        print("[ERREUR] Polar non trouve")
-        return
+# Services tree of each device seen, keyed by address
+CACHE_DIR = Path.home() / ".cache"
 
-    print(f"[OK] {polar.name} [{polar.address}]\n")
 
-    async with BleakClient(polar) as client:
-        print("=" * 60)
-        print("TOUS LES SERVICES & CARACTERISTIQUES GATT")
-        print("=" * 60)
+class StaleServicesCache(Exception):
+    """Le firmware a change depuis le snapshot: il faut redecouvrir les services."""
 
-        for service in client.services:
-            print(f"\n[SERVICE] {service.uuid}")
-            print(f"  Description: {service.description}")
 
-            for char in service.characteristics:
-                props = ", ".join(char.properties)
-                print(f"  |-- {char.uuid} [{props}]")
-                print(f"  |   Description: {char.description}")
+def _cache_path(address: str) -> Path:
+    return CACHE_DIR / f"polar_{address.replace(':', '').replace('-', '')}.pkl"
 
-                # Si c'est readable, on essaie de lire la valeur
-                if "read" in char.properties:
-                    try:
-                        val = await client.read_gatt_char(char.uuid)
-                        print(f"  |   Value: {val.hex()} ({list(val)})")
-                    except Exception as e:
-                        print(f"  |   Value: (erreur: {e})")
 
-                for desc in char.descriptors:
-                    print(f"  |   |-- Descriptor: {desc.uuid}")
+def load_services_cache(address: str) -> dict | None:
+    try:
+        with open(_cache_path(address), "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def drop_services_cache(address: str):
+    _cache_path(address).unlink(missing_ok=True)
+
+
+def save_services_cache(address: str, cache: dict):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(_cache_path(address), "wb") as f:
+        pickle.dump(cache, f)
+
+
+def services_tree(services) -> dict:
+    return {
+        svc.uuid: {
+            c.uuid: (tuple(c.properties), [d.uuid for d in c.descriptors])
+            for c in svc.characteristics
+        }
+        for svc in services
+    }
+
+
+async def read_firmware(client: BleakClient) -> str | None:
+    try:
+        return (await client.read_gatt_char(FIRMWARE_REVISION)).decode(errors="replace")
+    except Exception:
+        return None
+
+
+async def dump_services(client: BleakClient):
+    """Affiche l'arbre GATT, valeurs lisibles comprises."""
+    print("=" * 60)
+    print("TOUS LES SERVICES & CARACTERISTIQUES GATT")
+    print("=" * 60)
+
+    for service in client.services:
+        print(f"\n[SERVICE] {service.uuid}")
+        print(f"  Description: {service.description}")
+
+        for char in service.characteristics:
+            props = ", ".join(char.properties)
+            print(f"  |-- {char.uuid} [{props}]")
+            print(f"  |   Description: {char.description}")
+
+            # Si c'est readable, on essaie de lire la valeur
+            if "read" in char.properties:
+                try:
+                    val = await client.read_gatt_char(char.uuid)
+                    print(f"  |   Value: {val.hex()} ({list(val)})")
+                except Exception as e:
+                    print(f"  |   Value: (erreur: {e})")
+
+            for desc in char.descriptors:
+                print(f"  |   |-- Descriptor: {desc.uuid}")
+
+
+async def main(client: BleakClient):
+    cache = load_services_cache(client.address)
+    firmware = await read_firmware(client)
+
+    if cache is not None and firmware != cache["firmware"]:
+        print(f"[CACHE] Firmware {cache['firmware']} -> {firmware}, nouvelle decouverte")
+        drop_services_cache(client.address)
+        raise StaleServicesCache
+
+    await dump_services(client)
+
+    current = {"firmware": firmware, "services": services_tree(client.services)}
+    if current != cache:
+        save_services_cache(client.address, current)
+
+
+def client_options(address: str) -> dict:
+    # WinRT reuses the services cached by Windows once a snapshot exists
+    cached = load_services_cache(address) is not None
+    return {"winrt": {"use_cached_services": cached}}
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        run(main, client_options=client_options)
+    except StaleServicesCache:
+        # Snapshot dropped: the new connection rediscovers the services
+        run(main, client_options=client_options)